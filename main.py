@@ -1,11 +1,14 @@
 import pygame
 import argparse
-from datetime import datetime
 from src.movement import ClockFace
 from src.clockface.background_updater import BackgroundUpdater
-from src.settings import SettingsUI
+from src.settings import SettingsUI, PerfHUD
 from src.clockface.surface_manager import SurfaceManager
 from src.config import Config
+from src.utils.image_writer import ImageWriter
+from src.utils.text_cache import TextCache
+from src.utils.diagnostics import FrameTracer, install_signal_handlers
+from src.utils.time_source import get_time_source
 import os
 
 # Set Hugging Face cache directories
@@ -36,6 +39,44 @@ def parse_args():
     parser.add_argument('--windowed', action='store_true', help='Run in windowed mode instead of fullscreen')
     return parser.parse_args()
 
+def render_frame(screen, surface_manager, display_clock_face, background_updater, settings_ui, hud, seconds):
+    """Adopt any finished background and draw one frame (shared with soak.py)"""
+    # Pick up a finished background from the generation worker
+    background_updater.adopt_frame()
+    hud.lap('update')
+    
+    # Clear screen with pure black
+    screen.fill(BACKGROUND_COLOR)
+    
+    # Draw background with transitions
+    bg_surface = surface_manager.get_display_background()
+    if bg_surface:
+        screen.blit(bg_surface, (0, 0))
+    hud.lap('background')
+    
+    # Clear overlay surface to fully transparent
+    display_clock_face.overlay_surface.fill((0, 0, 0, 0))
+    
+    # Draw clock overlay (circle and markers) with solid white
+    display_clock_face.draw_clock_overlay(display_clock_face.overlay_surface)
+    
+    # Draw seconds hand on overlay with dominant color
+    display_clock_face.draw_seconds_hand(
+        display_clock_face.overlay_surface,
+        seconds,
+        background_updater.get_dominant_color()
+    )
+    
+    # Set the alpha for the entire overlay surface when blitting to screen
+    display_clock_face.overlay_surface.set_alpha(config.clock['overlay_opacity'])
+    screen.blit(display_clock_face.overlay_surface, (0, 0))
+    hud.lap('overlay')
+    
+    # Draw settings UI and the HUD on top
+    settings_ui.draw(screen)
+    hud.draw(screen)
+    hud.lap('settings')
+
 def main():
     args = parse_args()
     debug = args.debug
@@ -58,6 +99,7 @@ def main():
     
     # Initialize components
     clock = pygame.time.Clock()
+    TextCache().debug = debug  # Report text cache hit rates
     # Use render dimensions for the clock face that will be used for background generation
     render_clock_face = ClockFace(RENDER_WIDTH, RENDER_HEIGHT)
     # Use display dimensions for the actual display clock face
@@ -77,25 +119,39 @@ def main():
     settings_ui.background_updater = background_updater
     settings_ui.surface_manager = surface_manager
     
+    # Performance overlay (frame timing is always recorded, drawing is toggled)
+    hud = PerfHUD(background_updater)
+    
+    # Signal-triggered profiling and frame-time tracing for headless units
+    frame_tracer = FrameTracer(config.display['fps'], config.diagnostics.get('trace_interval', 5))
+    install_signal_handlers(frame_tracer)
+    
     running = True
     first_background_received = False
     
     # Force initial update
-    now = datetime.now()
+    now = get_time_source().now()
     hands_surface = render_clock_face.draw_clock_hands(now.hour, now.minute)
     surface_manager.update_hands(hands_surface)
     background_updater.update_background(hands_surface)
     
     while running:
+        hud.begin_frame()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type in (pygame.WINDOWHIDDEN, pygame.WINDOWMINIMIZED):
+                background_updater.set_display_active(False)
+            elif event.type in (pygame.WINDOWSHOWN, pygame.WINDOWRESTORED, pygame.WINDOWEXPOSED):
+                background_updater.set_display_active(True)
             elif event.type == pygame.MOUSEBUTTONDOWN:
+                background_updater.notify_activity()
                 if event.button == 1:  # Left click
                     if not settings_ui.handle_click(event.pos):
                         # If settings didn't handle the click, toggle settings
                         settings_ui.toggle()
             elif event.type == pygame.KEYDOWN:
+                background_updater.notify_activity()
                 if event.key == pygame.K_ESCAPE:
                     if settings_ui.visible:
                         settings_ui.visible = False
@@ -103,7 +159,7 @@ def main():
                         running = False
         
         # Get current time
-        now = datetime.now()
+        now = get_time_source().now()
         hours, minutes, seconds = now.hour, now.minute, now.second
         
         # Draw clock hands (for rendering)
@@ -112,37 +168,17 @@ def main():
             surface_manager.update_hands(hands_surface)
             background_updater.update_background(hands_surface)
         
-        # Clear screen with pure black
-        screen.fill(BACKGROUND_COLOR)
-        
-        # Draw background with transitions
-        bg_surface = surface_manager.get_display_background()
-        if bg_surface:
-            screen.blit(bg_surface, (0, 0))
-        
-        # Clear overlay surface to fully transparent
-        display_clock_face.overlay_surface.fill((0, 0, 0, 0))
-        
-        # Draw clock overlay (circle and markers) with solid white
-        display_clock_face.draw_clock_overlay(display_clock_face.overlay_surface)
-        
-        # Draw seconds hand on overlay with dominant color
-        display_clock_face.draw_seconds_hand(
-            display_clock_face.overlay_surface,
-            seconds,
-            background_updater.get_dominant_color()
-        )
-        
-        # Set the alpha for the entire overlay surface when blitting to screen
-        display_clock_face.overlay_surface.set_alpha(config.clock['overlay_opacity'])
-        screen.blit(display_clock_face.overlay_surface, (0, 0))
-        
-        # Draw settings UI
-        settings_ui.draw(screen)
+        render_frame(screen, surface_manager, display_clock_face, background_updater, settings_ui, hud, seconds)
         
         pygame.display.flip()
+        hud.lap('flip')
+        if hud.frame_times:
+            frame_tracer.record(hud.frame_times[-1])
         clock.tick(config.display['fps'])
 
+    # Stop a running generation, then let queued snapshots and debug images finish writing
+    background_updater.shutdown()
+    ImageWriter().flush(timeout=5)
     pygame.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,204 @@
+"""Accelerated-time soak run of the render loop.
+
+Runs the clock headless (SDL dummy driver) against a stub diffusion pipeline on a
+simulated clock, so thousands of background updates take minutes instead of days.
+Process RSS, Python object, pygame surface and thread counts are sampled along the
+way; the run fails (exit code 1) if any of them keeps growing after warm-up.
+
+    python soak.py --updates 2000
+"""
+import os
+import gc
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+from PIL import Image
+
+from main import render_frame, RENDER_WIDTH, RENDER_HEIGHT, WINDOWED_WIDTH, WINDOWED_HEIGHT
+from src.movement import ClockFace
+from src.clockface.background_updater import BackgroundUpdater
+from src.clockface.surface_manager import SurfaceManager
+from src.settings import SettingsUI, PerfHUD
+from src.config import Config
+from src.utils.diagnostics import process_rss
+from src.utils.time_source import SimulatedTimeSource, set_time_source
+
+class StubPipeline:
+    """Stands in for DiffusionPipeline: returns a solid image at the render size"""
+    def __init__(self, width, height, preview=True):
+        self.width = width
+        self.height = height
+        self.preview = preview
+        self.is_loading = False
+        self.is_ready = True
+        self.last_generation_mode = 'txt2img'
+        self.cancel_token = None
+        self.progress = ('idle', 0, 0)
+        self.calls = 0
+
+    def generate(self, source_image, prompt, preview_callback=None, **kwargs):
+        self.calls += 1
+        color = ((self.calls * 37) % 256, (self.calls * 91) % 256, (self.calls * 53) % 256)
+        if self.preview and preview_callback is not None:
+            preview_callback(Image.new('RGB', (self.width // 8, self.height // 8), color), 1, 2)
+        return Image.new('RGB', (self.width, self.height), color), self.calls
+
+    def cancel(self, reason):
+        pass
+
+    def device_memory(self):
+        return None
+
+    def reload(self, complete_callback=None, error_callback=None):
+        """Checkpoint changes from the settings panel reload instantly"""
+        if complete_callback:
+            complete_callback()
+
+    def generation_settings(self):
+        return {'scheduler': 'stub', 'width': self.width, 'height': self.height}
+
+    def _empty_cache(self):
+        pass
+
+class StubPromptGenerator:
+    def generate(self):
+        return "soak test", 0.0
+
+def count_surfaces():
+    """Distinct pygame surfaces referenced from any gc-tracked object.
+
+    Surfaces themselves are not tracked by the garbage collector, so they are found
+    through the containers and instances that hold them.
+    """
+    surfaces = set()
+    for obj in gc.get_objects():
+        for referent in gc.get_referents(obj):
+            if isinstance(referent, pygame.Surface):
+                surfaces.add(id(referent))
+    return len(surfaces)
+
+def take_sample(updates):
+    gc.collect()
+    return {
+        'updates': updates,
+        'rss_mb': (process_rss() or 0) / (1024 * 1024),
+        'objects': len(gc.get_objects()),
+        'surfaces': count_surfaces(),
+        'threads': threading.active_count(),
+    }
+
+def print_sample(sample):
+    print(f"updates={sample['updates']:6d}  rss={sample['rss_mb']:7.1f}MB  objects={sample['objects']:8d}  "
+          f"surfaces={sample['surfaces']:4d}  threads={sample['threads']:3d}")
+
+def check_growth(samples, warmup, args):
+    """Compare the end of the run with the first sample after warm-up; returns failure messages"""
+    baseline = next((s for s in samples if s['updates'] >= warmup), samples[0])
+    final = samples[-1]
+    limits = {
+        'rss_mb': args.max_rss_growth,
+        'objects': baseline['objects'] * args.max_object_growth / 100,
+        'surfaces': args.max_surface_growth,
+        'threads': 0,
+    }
+    failures = []
+    for key, limit in limits.items():
+        growth = final[key] - baseline[key]
+        if growth > limit:
+            failures.append(f"{key} grew by {growth:.1f} (limit {limit:.1f}) between "
+                            f"{baseline['updates']} and {final['updates']} updates")
+    return failures
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Accelerated-time soak test of the clock render loop')
+    parser.add_argument('--updates', type=int, default=2000, help='Background updates to run')
+    parser.add_argument('--frame-step', type=float, default=1.0, help='Simulated seconds per rendered frame')
+    parser.add_argument('--sample-every', type=int, default=100, help='Updates between resource samples')
+    parser.add_argument('--warmup', type=float, default=10, help='Percent of updates ignored before the baseline')
+    parser.add_argument('--max-rss-growth', type=float, default=50, help='Allowed RSS growth after warm-up (MB)')
+    parser.add_argument('--max-object-growth', type=float, default=5, help='Allowed Python object growth (percent)')
+    parser.add_argument('--max-surface-growth', type=int, default=10, help='Allowed pygame surface growth')
+    parser.add_argument('--no-preview', action='store_true', help='Do not publish step previews from the stub')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    config = Config()
+    clock_source = SimulatedTimeSource()
+    set_time_source(clock_source)
+
+    # Keep history and thread dumps out of the working tree; nothing is saved to local_config.yaml
+    work_dir = tempfile.mkdtemp(prefix='clock_soak_')
+    config.override('history', 'directory', value=os.path.join(work_dir, 'history'))
+    config.override('diagnostics', 'directory', value=os.path.join(work_dir, 'diagnostics'))
+
+    screen = pygame.display.set_mode((WINDOWED_WIDTH, WINDOWED_HEIGHT))
+    render_clock_face = ClockFace(RENDER_WIDTH, RENDER_HEIGHT)
+    display_clock_face = ClockFace(WINDOWED_WIDTH, WINDOWED_HEIGHT)
+    # No model download: it would add threads and memory to the samples and write local_config.yaml
+    settings_ui = SettingsUI(WINDOWED_WIDTH, WINDOWED_HEIGHT, auto_download=False)
+    surface_manager = SurfaceManager(WINDOWED_WIDTH, WINDOWED_HEIGHT, RENDER_WIDTH, RENDER_HEIGHT, settings_ui=settings_ui)
+    pipeline = StubPipeline(RENDER_WIDTH, RENDER_HEIGHT, preview=not args.no_preview)
+    background_updater = BackgroundUpdater(pipeline=pipeline, prompt_generator=StubPromptGenerator())
+    background_updater.set_surface_manager(surface_manager)
+    settings_ui.background_updater = background_updater
+    settings_ui.surface_manager = surface_manager
+    hud = PerfHUD(background_updater)
+
+    print(f"Soak run: {args.updates} updates, {args.frame_step}s simulated per frame, files in {work_dir}")
+    start_time = time.time()
+    samples = [take_sample(0)]
+    print_sample(samples[0])
+    frames = 0
+    # Same per-frame work as main.py, minus event handling and the frame-rate cap
+    while background_updater.generation_count < args.updates:
+        hud.begin_frame()
+        pygame.event.pump()
+        now = clock_source.now()
+        if background_updater.should_update():
+            hands_surface = render_clock_face.draw_clock_hands(now.hour, now.minute)
+            surface_manager.update_hands(hands_surface)
+            background_updater.update_background(hands_surface)
+            # Finish the update before simulated time moves on, so the watchdog never fires
+            worker = background_updater.update_thread
+            if worker is not None:
+                worker.join()
+            if background_updater.consecutive_failures >= background_updater.MAX_CONSECUTIVE_FAILURES:
+                background_updater.shutdown()
+                pygame.quit()
+                print(f"FAIL: {background_updater.consecutive_failures} consecutive update failures")
+                sys.exit(1)
+        render_frame(screen, surface_manager, display_clock_face, background_updater, settings_ui, hud, now.second)
+        pygame.display.flip()
+        hud.lap('flip')
+        clock_source.advance(args.frame_step)
+        frames += 1
+
+        updates = background_updater.generation_count
+        if updates != samples[-1]['updates'] and updates % args.sample_every == 0:
+            samples.append(take_sample(updates))
+            print_sample(samples[-1])
+
+    background_updater.shutdown()
+    if samples[-1]['updates'] != background_updater.generation_count:
+        samples.append(take_sample(background_updater.generation_count))
+        print_sample(samples[-1])
+    print(f"{frames} frames, {background_updater.generation_count} updates in {time.time() - start_time:.1f}s")
+
+    failures = check_growth(samples, args.updates * args.warmup / 100, args)
+    pygame.quit()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("PASS: no resource growth after warm-up")
+
+if __name__ == "__main__":
+    main()
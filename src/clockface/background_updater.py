@@ -1,19 +1,31 @@
 import time
 import os
 import threading
-from datetime import datetime
 
 import pygame
 from PIL import Image
 
 from .prompt_generator import PromptGenerator
 from .diffusion_pipeline import DiffusionPipeline
+from .step_callbacks import GenerationCancelled
+from .update_policy import UpdatePolicyFactory
+from .history import GenerationHistory
+from .frame_mailbox import BackgroundFrame, FrameMailbox
 from ..utils.image_utils import save_debug_image
+from ..utils.diagnostics import write_thread_dump
+from ..utils.time_source import get_time_source
 from ..config import Config
 
 class BackgroundUpdater:
-    # Watchdog timeout - if a thread runs longer than this, consider it hung
-    WATCHDOG_TIMEOUT = 120  # seconds
+    # Watchdog timeout - if a thread runs longer than this, cancel it (see _watchdog_timeout)
+    WATCHDOG_TIMEOUT = 120  # seconds, without a generation deadline on GPU/MPS
+    CPU_WATCHDOG_TIMEOUT = 1800  # seconds, without a deadline on CPU where one run can take many minutes
+    # With a deadline the watchdog fires this long after it (prompt enhancement plus one slow step)
+    WATCHDOG_DEADLINE_MARGIN = 60  # seconds
+    # Extra time a cancelled thread gets to stop before it is considered hung
+    CANCEL_GRACE_PERIOD = 30  # seconds
+    # Cancellation reasons that count as failures for backoff (reloads and shutdown don't)
+    FAILURE_CANCEL_REASONS = ("deadline", "watchdog")
     # Number of generations between GPU cache cleanup
     CACHE_CLEANUP_INTERVAL = 50
     # Maximum consecutive failures before forcing a longer backoff
@@ -21,7 +33,8 @@ class BackgroundUpdater:
     # Backoff multiplier after max failures (multiply update_interval by this)
     FAILURE_BACKOFF_MULTIPLIER = 3
     
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, pipeline=None, prompt_generator=None):
+        """pipeline and prompt_generator default to the real ones; the soak harness passes stubs"""
         self.config = Config()
         self.debug = debug
         self.surface_manager = None
@@ -31,18 +44,31 @@ class BackgroundUpdater:
         self.transition_duration = self.config.animation['transition_duration']
         self.update_interval = self.config.animation['background_update_interval']
         self.lock = threading.Lock()
+        # Finished frames are handed to the render loop here instead of under self.lock
+        self.mailbox = FrameMailbox()
+        self.preview_mailbox = FrameMailbox()  # previews of the generation in progress
         self.last_attempt = 0
         self.is_updating = False
         self.update_thread = None
         self.update_thread_start_time = 0  # Track when thread started for watchdog
-        self.prompt_generator = PromptGenerator()
+        self.phase = None  # 'enhancing' or 'generating' while an update runs
+        self.last_generation_time = None  # seconds taken by the last successful update
+        self.prompt_generator = prompt_generator if prompt_generator is not None else PromptGenerator()
+        self.update_policy = UpdatePolicyFactory.create_policy(self.config)
         
         # Reliability tracking
         self.generation_count = 0  # Track generations for periodic cleanup
         self.consecutive_failures = 0  # Track failures for backoff logic
         
+        # Persistent generation history
+        history_config = self.config.history
+        self.history = GenerationHistory(
+            history_config.get('directory', 'history'),
+            max_records=history_config.get('max_records', 2000)
+        ) if history_config.get('enabled', True) else None
+        
         # Initialize pipeline
-        self.pipeline = DiffusionPipeline(debug=debug)
+        self.pipeline = pipeline if pipeline is not None else DiffusionPipeline(debug=debug)
     
     def set_surface_manager(self, surface_manager):
         """Set the surface manager instance"""
@@ -65,11 +91,16 @@ class BackgroundUpdater:
         return (*brightest_pixel, self.config.clock['overlay_opacity'])
     
     def _get_background_image(self, hands_surface):
-        """Generate a new background image using Stable Diffusion with ControlNet"""
+        """Generate a new background image using Stable Diffusion with ControlNet.
+        
+        Returns (image, metadata), or (None, None) on failure.
+        """
         start_time = time.time()
         generation_start = None
         generation_end = None
         enhancement_time = 0.0
+        source_image = None
+        prompt = None
         
         try:
             # Convert pygame surface (RGB) to PIL Image
@@ -79,7 +110,9 @@ class BackgroundUpdater:
             source_image = Image.fromarray(array)
             
             # Generate prompt (this includes queueing and waiting for enhancement)
+            self.phase = 'enhancing'
             prompt, enhancement_time = self.prompt_generator.generate()
+            self.phase = 'generating'
             
             if self.debug:
                 save_debug_image(source_image, "prerender")
@@ -87,7 +120,7 @@ class BackgroundUpdater:
             
             # Generate image using pipeline
             generation_start = time.time()
-            image, seed = self.pipeline.generate(source_image, prompt)
+            image, seed = self.pipeline.generate(source_image, prompt, preview_callback=self._publish_preview)
             generation_end = time.time()
             
             if self.debug:
@@ -99,52 +132,159 @@ class BackgroundUpdater:
                 "prompt": prompt,
                 "seed": seed,
                 "checkpoint": os.path.basename(self.config.render['checkpoint']),
-                "timestamp": datetime.now().isoformat(),
-                "generation_config": self.config.render['generation']
+                "timestamp": get_time_source().now().isoformat(),
+                "generation_config": self.config.render['generation'],
+                "pipeline_settings": self.pipeline.generation_settings()
             }
             
-            # Update render request in surface manager
-            if self.surface_manager:
-                self.surface_manager.update_render_request(metadata)
-            
             # Log timing information
             total_time = time.time() - start_time
             generation_time = generation_end - generation_start if generation_start and generation_end else 0
             # Other time is what's left after generation (enhancement happens concurrently)
             other_time = total_time - generation_time
+            self.last_generation_time = total_time
             print(f"Background update completed in {total_time:.2f}s (prompt enhancement: {enhancement_time:.2f}s, generation: {generation_time:.2f}s, other: {other_time:.2f}s)")
             
-            return image
+            self._record_history(metadata, source_image, enhancement_time, generation_time, total_time)
+            return image, metadata
             
+        except GenerationCancelled as e:
+            total_time = time.time() - start_time
+            print(f"Background update stopped after {total_time:.2f}s: {e}")
+            self._record_history({
+                "status": "cancelled",
+                "error": str(e),
+                "prompt": prompt,
+                "checkpoint": os.path.basename(self.config.render['checkpoint']),
+                "timestamp": get_time_source().now().isoformat(),
+                "generation_config": self.config.render['generation'],
+                "pipeline_settings": self.pipeline.generation_settings()
+            }, source_image, enhancement_time, time.time() - generation_start if generation_start else 0.0, total_time)
+            raise
         except Exception as e:
             total_time = time.time() - start_time
             print(f"Background update failed after {total_time:.2f}s: {e}")
-            return None
+            self._record_history({
+                "status": "failed",
+                "error": str(e),
+                "prompt": prompt,
+                "checkpoint": os.path.basename(self.config.render['checkpoint']),
+                "timestamp": get_time_source().now().isoformat(),
+                "generation_config": self.config.render['generation'],
+                "pipeline_settings": self.pipeline.generation_settings()
+            }, source_image, enhancement_time, 0.0, total_time)
+            return None, None
+    
+    def _publish_preview(self, image, step, num_steps):
+        """Hand an intermediate preview to the render loop (worker thread)"""
+        if self.surface_manager:
+            self.preview_mailbox.publish(self.surface_manager.prepare_preview(image, step, num_steps))
+    
+    def _record_history(self, metadata, source_image, enhancement_time, generation_time, total_time):
+        """Append a generation to the history store"""
+        if self.history is None:
+            return
+        try:
+            record = dict(metadata)
+            record.update({
+                "negative_prompt": self.config.prompts['negative_prompt'],
+                "mode": self.pipeline.last_generation_mode if record.get("status", "ok") == "ok" else None,
+                "enhancement_time": enhancement_time,
+                "generation_time": generation_time,
+                "total_time": total_time
+            })
+            record_id = self.history.record(record, source_image)
+            if self.debug:
+                print(f"Recorded generation {record_id} in history")
+        except Exception as e:
+            print(f"Error recording generation history: {e}")
+    
+    def replay(self, record_id, strict=True):
+        """Regenerate a past image from the history deterministically.
+        
+        Uses the stored prompt, seed, generation config and control image. Continuity
+        (img2img) is disabled, so images that were continuity updates are replayed as
+        full generations. Checkpoint, sampler, generation size, clip skip, decoder and the
+        other load-time settings can't be switched per generation; if they differ from the
+        recorded ones a strict replay raises ValueError, otherwise a warning is printed.
+        Runs on the calling thread; returns the PIL image.
+        """
+        if self.history is None:
+            raise RuntimeError("Generation history is disabled")
+        record = self.history.get(record_id)
+        if record is None:
+            raise KeyError(f"No generation with id {record_id}")
+        control_image = self.history.load_control_image(record)
+        if control_image is None:
+            raise RuntimeError(f"Control image for generation {record_id} is missing")
+        
+        differences = self._replay_differences(record)
+        if differences:
+            message = f"Generation {record_id} can't be reproduced exactly: {'; '.join(differences)}"
+            if strict:
+                raise ValueError(message)
+            print(f"WARNING: {message}")
+        
+        gen_config = dict(record['generation_config'])
+        gen_config['continuity'] = {'enabled': False}
+        
+        with self.lock:
+            if self.is_updating or self.pipeline.is_loading:
+                raise RuntimeError("Pipeline is busy")
+            self.is_updating = True
+        try:
+            image, _ = self.pipeline.generate(
+                control_image,
+                record['prompt'],
+                negative_prompt=record['negative_prompt'],
+                seed=record['seed'],
+                gen_config=gen_config
+            )
+            return image
+        finally:
+            with self.lock:
+                self.is_updating = False
+    
+    def _replay_differences(self, record):
+        """Recorded settings that differ from the loaded pipeline, as readable strings"""
+        differences = []
+        current_checkpoint = os.path.basename(self.config.render['checkpoint'])
+        if record['checkpoint'] != current_checkpoint:
+            differences.append(f"checkpoint {record['checkpoint']} (loaded: {current_checkpoint})")
+        recorded = record.get('pipeline_settings')
+        if not recorded:
+            differences.append("pipeline settings were not recorded")
+            return differences
+        current = self.pipeline.generation_settings()
+        for key, value in recorded.items():
+            if current.get(key) != value:
+                differences.append(f"{key} {value} (loaded: {current.get(key)})")
+        return differences
     
     def _do_update(self, hands_surface):
         """Internal method that runs in a separate thread to update the background"""
         success = False
         try:
-            new_bg = self._get_background_image(hands_surface)
+            new_bg, metadata = self._get_background_image(hands_surface)
             if new_bg:
+                # Build the display-ready frame here, outside any lock the render loop uses
+                color = self._extract_dominant_color(new_bg)
+                if self.surface_manager:
+                    frame = self.surface_manager.prepare_frame(new_bg, color, metadata)
+                else:
+                    frame = BackgroundFrame(None, None, color, metadata)
+                if self.mailbox.publish(frame) and self.debug:
+                    print("Replaced a finished frame the display had not picked up yet")
+                
                 with self.lock:
-                    # Store the current color as previous for transition
-                    self.previous_color = self.current_color
-                    self.current_color = self._extract_dominant_color(new_bg)
-                    self.transition_start = time.time()
-                    
-                    # Update background in surface manager
-                    if self.surface_manager:
-                        self.surface_manager.update_background(new_bg)
-                    
                     # Track successful generation
                     self.generation_count += 1
                     self.consecutive_failures = 0  # Reset failure counter on success
                     success = True
                     
                     if self.debug:
-                        print(f"Background updated at {datetime.now().strftime('%H:%M:%S')}")
-                        print(f"New brightest color: RGB{self.current_color[:3]} (15% opacity)")
+                        print(f"Background updated at {get_time_source().now().strftime('%H:%M:%S')}")
+                        print(f"New brightest color: RGB{color[:3]} (15% opacity)")
                         print(f"Generation count: {self.generation_count}")
                 
                 # Periodic GPU cache cleanup (outside lock to avoid blocking)
@@ -156,14 +296,22 @@ class BackgroundUpdater:
                     self.consecutive_failures += 1
                     if self.debug:
                         print(f"Generation failed. Consecutive failures: {self.consecutive_failures}")
+        except GenerationCancelled as e:
+            if e.reason in self.FAILURE_CANCEL_REASONS:
+                with self.lock:
+                    self.consecutive_failures += 1
         except Exception as e:
             # Catch any unexpected errors in the update thread
             print(f"Unexpected error in background update thread: {e}")
             with self.lock:
                 self.consecutive_failures += 1
         finally:
+            if not success:
+                # Remove the preview of a generation that produced no image
+                self.preview_mailbox.publish(BackgroundFrame(None, None, None))
             with self.lock:
                 self.is_updating = False
+                self.phase = None
                 self.update_thread = None
                 self.update_thread_start_time = 0
     
@@ -185,17 +333,42 @@ class BackgroundUpdater:
             for c1, c2 in zip(color1, color2)
         )
     
+    def adopt_frame(self):
+        """Apply the newest finished frame, if any. Call at the start of each frame.
+        
+        Runs on the render thread, which owns the displayed surfaces and colours, so
+        neither needs the worker lock.
+        """
+        frame = self.mailbox.take()
+        preview = self.preview_mailbox.take()
+        if frame is None:
+            # Previews only matter while the final image isn't there yet
+            if preview is not None and self.surface_manager:
+                if preview.display_background is None:
+                    self.surface_manager.clear_preview()
+                else:
+                    self.surface_manager.adopt_preview(preview)
+            return False
+        
+        # Store the current color as previous for transition
+        self.previous_color = self.current_color
+        self.current_color = frame.color
+        self.transition_start = time.time()
+        
+        if self.surface_manager and frame.display_background is not None:
+            self.surface_manager.adopt_frame(frame)
+        return True
+    
     def get_dominant_color(self):
-        """Get the current dominant color with transition"""
-        with self.lock:
-            if not self.previous_color:
-                return self.current_color
-            
-            # Calculate transition progress
-            progress = min(1.0, (time.time() - self.transition_start) / self.transition_duration)
-            
-            # Interpolate between previous and current color
-            return self._interpolate_color(self.previous_color, self.current_color, progress)
+        """Get the current dominant color with transition (render thread only)"""
+        if not self.previous_color:
+            return self.current_color
+        
+        # Calculate transition progress
+        progress = min(1.0, (time.time() - self.transition_start) / self.transition_duration)
+        
+        # Interpolate between previous and current color
+        return self._interpolate_color(self.previous_color, self.current_color, progress)
     
     def _check_and_recover_stuck_thread(self, current_time):
         """Check if update thread is stuck and recover if necessary.
@@ -211,8 +384,19 @@ class BackgroundUpdater:
         if self.update_thread is not None and self.update_thread.is_alive():
             # Thread is running - check if it's exceeded the watchdog timeout
             elapsed = current_time - self.update_thread_start_time
-            if elapsed > self.WATCHDOG_TIMEOUT:
-                print(f"WARNING: Background update thread exceeded watchdog timeout ({elapsed:.1f}s > {self.WATCHDOG_TIMEOUT}s)")
+            watchdog_timeout = self._watchdog_timeout()
+            if watchdog_timeout < elapsed <= watchdog_timeout + self.CANCEL_GRACE_PERIOD:
+                if self.pipeline.cancel_token is not None and self.pipeline.cancel_token.reason is None:
+                    # Record where the worker is stuck before stopping it
+                    try:
+                        write_thread_dump("watchdog")
+                    except OSError as e:
+                        print(f"Error writing thread dump: {e}")
+                # Stop the run at its next step; the thread then exits on its own
+                self.pipeline.cancel("watchdog")
+                return False
+            if elapsed > watchdog_timeout:
+                print(f"WARNING: Background update thread did not stop within {self.CANCEL_GRACE_PERIOD}s of being cancelled ({elapsed:.1f}s)")
                 print("Forcing recovery - thread will be orphaned (daemon thread will be cleaned up on exit)")
                 # Force reset the state - the old thread is orphaned but will eventually die
                 # or be cleaned up when the process exits (it's a daemon thread)
@@ -238,8 +422,23 @@ class BackgroundUpdater:
             self.update_thread_start_time = 0
             return True
     
-    def _get_effective_update_interval(self):
-        """Get the effective update interval, accounting for failure backoff.
+    def _watchdog_timeout(self):
+        """Seconds an update may run before the watchdog cancels it.
+        
+        Always later than render.generation.deadline, so the deadline stops slow runs and
+        the watchdog only catches threads that stopped making progress. Without a deadline
+        it allows for the device and for three times the last update's duration.
+        """
+        deadline = self.config.render['generation'].get('deadline', 0)
+        if deadline:
+            return deadline + self.WATCHDOG_DEADLINE_MARGIN
+        timeout = self.CPU_WATCHDOG_TIMEOUT if getattr(self.pipeline, 'device', None) == "cpu" else self.WATCHDOG_TIMEOUT
+        if self.last_generation_time:
+            timeout = max(timeout, 3 * self.last_generation_time)
+        return timeout
+    
+    def _get_backoff_interval(self):
+        """Get the minimum gap between attempts imposed by failure backoff (0 when healthy).
         
         Must be called with self.lock held.
         """
@@ -248,43 +447,81 @@ class BackgroundUpdater:
             if self.debug:
                 print(f"Applying failure backoff: {backoff_interval}s (normal: {self.update_interval}s)")
             return backoff_interval
-        return self.update_interval
+        return 0
+    
+    def _is_update_due(self, current_time):
+        """Ask the update policy whether a new generation is due.
+        
+        Must be called with self.lock held.
+        """
+        return self.update_policy.should_update(current_time, self.last_attempt, self._get_backoff_interval())
+    
+    def worker_state(self):
+        """Short description of what the generation worker is doing (for the HUD)"""
+        if self.pipeline.is_loading:
+            return "loading model"
+        if not self.pipeline.is_ready:
+            return "no model loaded"
+        if not self.is_updating:
+            return "idle"
+        if self.phase == 'enhancing':
+            return "enhancing prompt"
+        state, step, num_steps = self.pipeline.progress
+        if state == 'denoising':
+            return f"denoising step {step}/{num_steps}"
+        return state
+    
+    def set_display_active(self, active):
+        """Pause generation while the display is hidden or off"""
+        if self.debug and active != self.update_policy.display_active:
+            print(f"Display {'active' if active else 'inactive'}, background updates {'resumed' if active else 'paused'}")
+        self.update_policy.set_display_active(active)
+    
+    def notify_activity(self):
+        """Record user input (used by the quiet hours policy)"""
+        self.update_policy.notify_activity()
 
     def update_background(self, hands_surface):
         """Start a background update if conditions are met"""
-        current_time = time.time()
+        current_time = get_time_source().time()
         with self.lock:
             # First, check for and recover from stuck threads (watchdog)
             self._check_and_recover_stuck_thread(current_time)
             
-            # Get effective interval (may be longer if we've had consecutive failures)
-            effective_interval = self._get_effective_update_interval()
-            
-            # Don't update if we're already updating or if the pipeline is loading
-            if self.is_updating or self.pipeline.is_loading:
+            # Don't update if we're already updating or no model is loaded yet
+            if self.is_updating or not self.pipeline.is_ready:
                 return
             
-            # Check if enough time has passed since last attempt
-            if (current_time - self.last_attempt) < effective_interval:
+            # Check the update policy (interval, minute change, quiet hours, display state)
+            if not self._is_update_due(current_time):
                 return
                 
             self.is_updating = True
             self.last_attempt = current_time
             self.update_thread_start_time = current_time  # Track for watchdog
             
-            # Create and start a new thread for the update
+            # Create and start a new thread for the update; the worker gets its own copy
+            # of the hands since the render loop redraws that surface
             self.update_thread = threading.Thread(
                 target=self._do_update,
-                args=(hands_surface,)
+                args=(hands_surface.copy(),)
             )
             self.update_thread.daemon = True  # Thread will be killed when main program exits
             self.update_thread.start()
     
     def should_update(self):
         """Check if it's time for a background update"""
+        if not self.pipeline.is_ready:
+            return False
         with self.lock:
-            effective_interval = self._get_effective_update_interval()
-            return time.time() - self.last_attempt >= effective_interval
+            return self._is_update_due(get_time_source().time())
+    
+    def shutdown(self, timeout=5):
+        """Cancel a running generation and give its thread a moment to exit"""
+        self.pipeline.cancel("shutdown")
+        thread = self.update_thread
+        if thread is not None:
+            thread.join(timeout)
     
     def reload_pipeline(self, complete_callback=None, error_callback=None):
         """Reload the pipeline with new configuration"""
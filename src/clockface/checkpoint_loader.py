@@ -0,0 +1,93 @@
+import gc
+
+from safetensors import safe_open
+from accelerate import init_empty_weights
+from accelerate.utils import set_module_tensor_to_device
+from transformers import CLIPTextConfig, CLIPTextModel, CLIPTokenizer
+from diffusers import UNet2DConditionModel, DDIMScheduler, StableDiffusionControlNetPipeline
+from diffusers.loaders.single_file_utils import convert_ldm_unet_checkpoint
+
+LDM_UNET_PREFIX = 'model.diffusion_model.'
+LDM_TEXT_ENCODER_PREFIX = 'cond_stage_model.transformer.'
+
+class _KeyRef:
+    """Stands in for a tensor during key conversion, remembering its checkpoint key"""
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+def _unet_key_mapping(keys, unet_config):
+    """Map diffusers UNet parameter names to original checkpoint keys.
+
+    Runs the diffusers LDM->diffusers conversion on placeholders instead of tensors,
+    so no weights are read. SD 1.x UNet conversion is a pure renaming.
+    """
+    probe = {key: _KeyRef(key) for key in keys if key.startswith(LDM_UNET_PREFIX)}
+    converted = convert_ldm_unet_checkpoint(probe, dict(unet_config))
+    return {name: ref.key for name, ref in converted.items()}
+
+def _text_encoder_key_mapping(keys, model):
+    """Map CLIPTextModel parameter names to original checkpoint keys (prefix strip)"""
+    expected = set(model.state_dict().keys())
+    mapping = {}
+    for key in keys:
+        if key.startswith(LDM_TEXT_ENCODER_PREFIX):
+            name = key[len(LDM_TEXT_ENCODER_PREFIX):]
+            if name in expected:
+                mapping[name] = key
+    return mapping
+
+def _stream_into(model, handle, mapping, device, dtype):
+    """Copy tensors one at a time from the mapped file into an empty-weights model"""
+    for name, key in mapping.items():
+        tensor = handle.get_tensor(key)
+        set_module_tensor_to_device(model, name, device, value=tensor, dtype=dtype if tensor.is_floating_point() else None)
+        del tensor
+
+    missing = [name for name, param in model.named_parameters() if param.device.type == 'meta']
+    if missing:
+        raise ValueError(f"{len(missing)} parameters missing from checkpoint, e.g. {missing[0]}")
+    # Buffers (e.g. position ids) were created outside the empty-weights context
+    return model.to(device)
+
+def load_streamed_pipeline(checkpoint_path, base_model, device, dtype, vae, controlnet, debug=False):
+    """Build the ControlNet pipeline by streaming a safetensors checkpoint to the device.
+
+    The file is memory-mapped and each tensor goes straight into its parameter on the
+    target device, so peak memory stays near the model size instead of holding a full
+    CPU copy of the checkpoint alongside the loaded model. Model configs and the
+    tokenizer come from base_model; the VAE and ControlNet are passed in.
+    """
+    with safe_open(checkpoint_path, framework="pt", device=str(device)) as handle:
+        keys = list(handle.keys())
+
+        # UNet
+        with init_empty_weights():
+            unet = UNet2DConditionModel.from_config(UNet2DConditionModel.load_config(base_model, subfolder="unet"))
+        unet = _stream_into(unet, handle, _unet_key_mapping(keys, unet.config), device, dtype)
+        if debug:
+            print("Streamed UNet weights from checkpoint")
+
+        # Text encoder
+        with init_empty_weights():
+            text_encoder = CLIPTextModel(CLIPTextConfig.from_pretrained(base_model, subfolder="text_encoder"))
+        text_encoder = _stream_into(text_encoder, handle, _text_encoder_key_mapping(keys, text_encoder), device, dtype)
+        if debug:
+            print("Streamed text encoder weights from checkpoint")
+
+    gc.collect()
+    tokenizer = CLIPTokenizer.from_pretrained(base_model, subfolder="tokenizer")
+    scheduler = DDIMScheduler.from_pretrained(base_model, subfolder="scheduler")
+
+    return StableDiffusionControlNetPipeline(
+        vae=vae,
+        text_encoder=text_encoder,
+        tokenizer=tokenizer,
+        unet=unet,
+        controlnet=controlnet,
+        scheduler=scheduler,
+        safety_checker=None,
+        feature_extractor=None,
+        requires_safety_checker=False
+    )
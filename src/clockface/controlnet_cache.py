@@ -0,0 +1,51 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+def hash_control_image(image):
+    """Content hash of a PIL control image"""
+    array = np.asarray(image)
+    digest = hashlib.sha1(array.tobytes())
+    digest.update(str(array.shape).encode())
+    return digest.hexdigest()
+
+class ControlNetConditioningCache(torch.nn.Module):
+    """Caching wrapper for ControlNetModel.controlnet_cond_embedding.
+
+    The conditioning encoder only depends on the control image, yet the pipeline runs it
+    on every denoising step. Its output is cached per control-image hash (set through
+    `key` before each generation), so it runs once per distinct clock face instead of
+    once per step. The down-block residuals also depend on the noisy latents and the
+    prompt, so they cannot be reused across generations.
+    """
+    def __init__(self, embedding, max_entries=8):
+        super().__init__()
+        self.embedding = embedding
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.key = None
+        self.hits = 0
+        self.misses = 0
+
+    def forward(self, conditioning):
+        if self.key is None:
+            return self.embedding(conditioning)
+
+        # The batch doubles while classifier-free guidance runs, so the shape is part of the key
+        cache_key = (self.key, tuple(conditioning.shape), conditioning.dtype, str(conditioning.device))
+        if cache_key in self.entries:
+            self.entries.move_to_end(cache_key)
+            self.hits += 1
+            return self.entries[cache_key]
+
+        self.misses += 1
+        embedding = self.embedding(conditioning)
+        self.entries[cache_key] = embedding
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return embedding
+
+    def clear(self):
+        self.entries.clear()
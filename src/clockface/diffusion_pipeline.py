@@ -1,27 +1,113 @@
+import os
 import torch
 import gc
+import math
 import time
+import random
 import threading
-from diffusers import AutoencoderKL, ControlNetModel, StableDiffusionControlNetPipeline, DPMSolverMultistepScheduler
+import traceback
+import importlib.util
+from PIL import Image
+from diffusers import (
+    AutoencoderKL,
+    AutoencoderTiny,
+    ControlNetModel,
+    StableDiffusionControlNetPipeline,
+    StableDiffusionControlNetImg2ImgPipeline,
+    DPMSolverMultistepScheduler,
+    EulerAncestralDiscreteScheduler,
+    LCMScheduler,
+    TCDScheduler,
+)
 from compel import Compel
 from ..config import Config
+from ..utils.device_utils import get_execution_profile
+from ..utils.model_catalog import ModelCatalog
+from .step_callbacks import (
+    StepCallbacks,
+    GuidanceWindowCallback,
+    LatentCaptureCallback,
+    CancellationToken,
+    CancellationCallback,
+    GenerationCancelled,
+    PreviewCallback,
+    StepTimingCallback,
+    ProgressCallback,
+)
+from .controlnet_cache import ControlNetConditioningCache, hash_control_image
+from .checkpoint_loader import load_streamed_pipeline
+from .exported_backend import ExportedBackend, EXPORTED_BACKENDS
+from .feature_cache import UNetFeatureCache
+
+# Samplers selectable via render.generation.scheduler: (scheduler class, from_config overrides)
+SCHEDULERS = {
+    "dpmsolver++": (DPMSolverMultistepScheduler, {
+        "algorithm_type": "dpmsolver++",
+        "timestep_spacing": "trailing",
+        "use_karras_sigmas": True,
+    }),
+    "euler_a": (EulerAncestralDiscreteScheduler, {"timestep_spacing": "trailing"}),
+    "lcm": (LCMScheduler, {"timestep_spacing": "trailing"}),
+    "tcd": (TCDScheduler, {"timestep_spacing": "trailing"}),
+}
+
+# Samplers that need a distilled adapter and run few-step, CFG-free generation
+DISTILLED_SCHEDULERS = ("lcm", "tcd")
+
+def _scaled_size(width, height, scale):
+    """Scale (width, height) to multiples of 8 without changing the aspect ratio.
+    
+    Uses the exact-ratio size nearest to the requested scale (e.g. 640x360 at 0.75 gives
+    512x288). If no such size is within 10% of the scale, the width is snapped and the
+    height derived from it.
+    """
+    divisor = math.gcd(width, height)
+    ratio_w, ratio_h = width // divisor, height // divisor
+    # Smallest multiplier of the reduced ratio that makes both sides multiples of 8
+    step = math.lcm(8 // math.gcd(8, ratio_w), 8 // math.gcd(8, ratio_h))
+    multiplier = min(round(divisor * scale / step) * step, divisor // step * step)
+    if multiplier > 0 and abs(multiplier / divisor - scale) <= 0.1 * scale:
+        return ratio_w * multiplier, ratio_h * multiplier
+    scaled_width = max(8, int(width * scale) // 8 * 8)
+    return scaled_width, max(8, round(scaled_width * height / width / 8) * 8)
 
 class DiffusionPipeline:
     def __init__(self, debug=False):
         self.config = Config()
         self.debug = debug
         self.device = self._get_device()
+        self.profile = get_execution_profile(self.device)
         self.pipe = None
+        self.backend = None  # exported-graph runtime used instead of eager torch, if configured
+        self.tiny_vae = None  # TAESD decoder for previews (and the final decode if models.decoder is 'tiny')
+        self.img2img_pipe = None  # shares components with self.pipe, created on first use
+        self.previous_latents = None  # final latents of the last image, for continuity mode
+        self.continuity_count = 0  # consecutive img2img generations since the last full one
+        self.controlnet_cache = None
+        self.feature_cache = None  # cross-step reuse of deep UNet features
+        self.token_merging = False  # whether the tomesd patch is applied to self.pipe
+        self.loaded_settings = {}  # load-time settings that affect the image, see generation_settings()
+        self.last_generation_mode = None  # 'txt2img' or 'img2img' (continuity) for the last image
+        self.progress = ('idle', 0, 0)  # (state, step, num_steps) of the running generation
         self.is_loading = False
+        # Held for the whole of a generation; reloads wait on it after cancelling the run
+        self.generation_lock = threading.Lock()
+        self.cancel_token = None  # token of the running generation
         self.reload_complete_callback = None
         self.reload_error_callback = None
         
         if self.debug:
             print(f"Using device: {self.device}")
+        print(f"Execution profile: {self.profile.describe()}")
         
         # Initialize pipeline
         self._initialize_pipeline()
     
+    @property
+    def is_ready(self):
+        """Whether a model is loaded (not the case while the default checkpoint downloads)"""
+        return self.pipe is not None and not self.is_loading
+
     def _get_device(self):
         """Determine the appropriate device (CUDA, MPS, or CPU)"""
         if torch.cuda.is_available():
@@ -47,8 +133,19 @@ class DiffusionPipeline:
         """Clean up the existing pipeline to free GPU memory"""
         if hasattr(self, 'pipe') and self.pipe is not None:
             try:
+                # Undo the UNet patches in reverse order of installation
+                if self.feature_cache is not None:
+                    self.feature_cache.remove()
+                self._remove_token_merging()
                 del self.pipe
                 self.pipe = None
+                self.backend = None
+                self.tiny_vae = None
+                self.img2img_pipe = None
+                self.previous_latents = None
+                self.continuity_count = 0
+                self.controlnet_cache = None
+                self.feature_cache = None
                 self._empty_cache()
                 time.sleep(1)  # Small delay to ensure cleanup
             except Exception as e:
@@ -60,35 +157,87 @@ class DiffusionPipeline:
         if self.debug:
             print("Initializing Stable Diffusion pipeline...")
         
+        if not os.path.exists(self.config.render['checkpoint']):
+            # e.g. the default model is still downloading; it is loaded via reload()
+            print(f"Checkpoint not found: {self.config.render['checkpoint']}, pipeline not loaded")
+            return
+        # Same check as reload(), so a checkpoint that can't be loaded fails the same way at startup
+        compatible, reason = self._check_checkpoint()
+        if not compatible:
+            print(f"Pipeline not loaded: {reason}")
+            return
+        
         self._load_pipeline()
 
     def _load_pipeline(self):
         """Load the pipeline with current configuration"""
-        # Load VAE
-        vae = AutoencoderKL.from_pretrained(
-            self.config.render['models']['vae'],
-            torch_dtype=torch.float16
-        ).to(self.device)
+        # Pick dtype, attention backend and thread counts for this device
+        self.profile = get_execution_profile(self.device)
+        self.profile.apply_threads()
+        dtype = self.profile.dtype
+        
+        # Load VAE (the tiny autoencoder replaces it when selected as the decoder)
+        models_config = self.config.render['models']
+        use_tiny_decoder = models_config.get('decoder', 'vae') == 'tiny'
+        if use_tiny_decoder or self.config.render.get('preview', {}).get('enabled', False):
+            self.tiny_vae = AutoencoderTiny.from_pretrained(
+                models_config.get('tiny_vae', 'madebyollin/taesd'),
+                torch_dtype=dtype
+            ).to(self.device)
+        if use_tiny_decoder:
+            vae = self.tiny_vae
+            if self.debug:
+                print(f"Using tiny autoencoder as the decoder: {models_config.get('tiny_vae', 'madebyollin/taesd')}")
+        else:
+            vae = AutoencoderKL.from_pretrained(
+                models_config['vae'],
+                torch_dtype=dtype
+            ).to(self.device)
         
         # Load ControlNet
         controlnet = ControlNetModel.from_pretrained(
             self.config.render['models']['controlnet'],
-            torch_dtype=torch.float16
+            torch_dtype=dtype
         ).to(self.device)
         
         # Load main model
-        self.pipe = StableDiffusionControlNetPipeline.from_single_file(
-            self.config.render['checkpoint'],
-            controlnet=controlnet,
-            torch_dtype=torch.float16,
-            safety_checker=None,
-            generator=torch.Generator(device=self.device),
-            vae=vae
-        ).to(self.device)
+        self.pipe = None
+        streaming_failed = False
+        loading_config = self.config.render.get('loading', {})
+        if loading_config.get('mmap', True) and self.config.render['checkpoint'].endswith('.safetensors'):
+            try:
+                # Stream tensors from the memory-mapped file straight to the device
+                self.pipe = load_streamed_pipeline(
+                    self.config.render['checkpoint'],
+                    loading_config.get('base_model', 'stable-diffusion-v1-5/stable-diffusion-v1-5'),
+                    self.device,
+                    dtype,
+                    vae,
+                    controlnet,
+                    debug=self.debug
+                )
+            except Exception:
+                print(f"Streaming checkpoint load failed, falling back to from_single_file:\n{traceback.format_exc()}")
+                streaming_failed = True
+            if streaming_failed:
+                # Freed outside the handler: the traceback keeps the half-loaded tensors alive
+                self.pipe = None
+                self._empty_cache()
+        
+        if self.pipe is None:
+            self.pipe = StableDiffusionControlNetPipeline.from_single_file(
+                self.config.render['checkpoint'],
+                controlnet=controlnet,
+                torch_dtype=dtype,
+                safety_checker=None,
+                generator=torch.Generator(device=self.device),
+                vae=vae
+            ).to(self.device)
 
-        # Enable memory efficient attention
-        if self.device == "cuda":
-            self.pipe.enable_xformers_memory_efficient_attention()
+        # Select the attention implementation for this device
+        self.profile.apply_attention(self.pipe)
+        if self.debug:
+            print(f"Attention implementation: {self.profile.attention}")
         
         # Apply CLIP skip by truncating layers
         total_layers = len(self.pipe.text_encoder.text_model.encoder.layers)
@@ -101,32 +250,324 @@ class DiffusionPipeline:
         if clip_skip > 1:
             self.pipe.text_encoder.text_model.encoder.layers = self.pipe.text_encoder.text_model.encoder.layers[:layers_to_keep]
 
-        # Set up scheduler
-        scheduler = DPMSolverMultistepScheduler.from_config(
-            self.pipe.scheduler.config,
-            algorithm_type="dpmsolver++",
-            timestep_spacing="trailing",
-            use_karras_sigmas=True,
-        )
-        self.pipe.scheduler = scheduler
+        # Set up scheduler (and distilled adapter for few-step samplers)
+        self._setup_scheduler()
+        
+        # Optional exported-graph runtime; it replaces the torch-level optimizations below
+        self.backend = self._create_backend()
+        quantization = "none"
+        if self.backend is None:
+            # int8 quantization on CPU (after the distilled adapter is fused)
+            self.profile.apply_quantization(self.pipe)
+            quantization = self.profile.quantization
+            if quantization != "none":
+                print(f"Quantized UNet, ControlNet and text encoder: {quantization}")
+            
+            # Cache the ControlNet conditioning embedding per control image
+            self._install_controlnet_cache()
+            
+            # Merge redundant spatial tokens before self-attention
+            self._apply_token_merging()
+            
+            # Reuse deep UNet features on alternate steps
+            self._install_feature_cache()
+            
+            # Optional compiled/optimized denoiser, warmed up at the fixed render size
+            if self._optimize_denoiser():
+                self._warmup()
+        
+        self.loaded_settings = {
+            "scheduler": self.scheduler_name,
+            "adapter": self._get_distilled_adapter(self.config.render['generation']),
+            "clip_skip": clip_skip,
+            "controlnet": models_config['controlnet'],
+            "decoder": models_config.get('tiny_vae', 'madebyollin/taesd') if use_tiny_decoder else models_config['vae'],
+            "backend": self.config.render.get('backend', {}).get('runtime', 'torch') if self.backend is not None else 'torch',
+            "quantization": quantization,
+        }
         
         if self.debug:
             print("Pipeline initialized successfully")
 
+    def generation_settings(self):
+        """Settings outside render.generation that change the image, recorded for replays"""
+        width, height = self._get_generation_size()
+        return dict(self.loaded_settings, width=width, height=height)
+
+    def _setup_scheduler(self):
+        """Install the sampler selected by render.generation.scheduler"""
+        gen_config = self.config.render['generation']
+        name = gen_config.get('scheduler', 'dpmsolver++')
+        if name not in SCHEDULERS:
+            print(f"Unknown scheduler '{name}', falling back to dpmsolver++")
+            name = 'dpmsolver++'
+        
+        scheduler_class, scheduler_kwargs = SCHEDULERS[name]
+        self.pipe.scheduler = scheduler_class.from_config(self.pipe.scheduler.config, **scheduler_kwargs)
+        self.scheduler_name = name
+        
+        if name in DISTILLED_SCHEDULERS:
+            adapter = self._get_distilled_adapter(gen_config)
+            if adapter:
+                # Fuse the distilled LoRA into the UNet so it costs nothing per step
+                self.pipe.load_lora_weights(adapter, adapter_name="distilled")
+                self.pipe.fuse_lora()
+                self.pipe.unload_lora_weights()
+                if self.debug:
+                    print(f"Fused distilled adapter: {adapter}")
+            else:
+                print(f"Scheduler '{name}' expects a distilled adapter but none is configured")
+        
+        steps, guidance_scale = self._get_sampling_params(gen_config)
+        print(f"Sampler: {name} ({steps} steps, guidance scale {guidance_scale})")
+
+    def _get_distilled_adapter(self, gen_config):
+        """LoRA distilled for the active sampler (render.generation.distilled.adapters), or None"""
+        if self.scheduler_name not in DISTILLED_SCHEDULERS:
+            return None
+        return gen_config.get('distilled', {}).get('adapters', {}).get(self.scheduler_name)
+
+    def _create_backend(self):
+        """Export the models for the runtime selected by render.backend, or return None for torch"""
+        backend_config = self.config.render.get('backend', {})
+        runtime = backend_config.get('runtime', 'torch')
+        if runtime == 'torch':
+            return None
+        if runtime not in EXPORTED_BACKENDS:
+            print(f"Unknown backend '{runtime}', using torch")
+            return None
+        if self.device != "cpu":
+            print(f"The {runtime} backend is for CPU hosts, using torch on {self.device}")
+            return None
+        
+        width, height = self._get_generation_size()
+        models_config = self.config.render['models']
+        checkpoint = self.config.render['checkpoint']
+        gen_config = self.config.render['generation']
+        settings = {
+            "checkpoint": os.path.basename(checkpoint),
+            "checkpoint_mtime": os.path.getmtime(checkpoint),
+            "controlnet": models_config['controlnet'],
+            "decoder": models_config.get('tiny_vae') if models_config.get('decoder', 'vae') == 'tiny' else models_config['vae'],
+            "clip_skip": self.config.render.get('clip_skip', 1),
+            "adapter": self._get_distilled_adapter(gen_config),
+        }
+        try:
+            backend = ExportedBackend(
+                self.pipe,
+                runtime,
+                width,
+                height,
+                backend_config.get('cache_dir', 'cache/exported'),
+                ExportedBackend.cache_key(settings),
+                num_threads=self.profile.num_threads,
+                providers=backend_config.get('providers'),
+                opset=backend_config.get('opset', 17),
+                debug=self.debug
+            )
+        except Exception as e:
+            print(f"{runtime} backend unavailable ({e}), using torch")
+            return None
+        
+        # Generation no longer uses the eager weights; keep only configs, tokenizer and scheduler
+        for name in ("unet", "controlnet", "text_encoder", "vae"):
+            getattr(self.pipe, name).to("meta")
+        self._empty_cache()
+        print(f"Generation backend: {runtime} ({width}x{height})")
+        return backend
+
+    def _install_controlnet_cache(self):
+        """Wrap the ControlNet conditioning encoder with a per-control-image cache"""
+        cache_config = self.config.render.get('controlnet_cache', {})
+        if not cache_config.get('enabled', False):
+            return
+        if self._uses_compile():
+            print("ControlNet conditioning cache is not used with compiled models")
+            return
+        
+        controlnet = self.pipe.controlnet
+        self.controlnet_cache = ControlNetConditioningCache(
+            controlnet.controlnet_cond_embedding,
+            max_entries=cache_config.get('max_entries', 8)
+        )
+        controlnet.controlnet_cond_embedding = self.controlnet_cache
+
+    def _apply_token_merging(self):
+        """Patch the UNet with ToMe token merging (tomesd) at render.generation.token_merging.ratio"""
+        tome_config = self.config.render['generation'].get('token_merging', {})
+        ratio = tome_config.get('ratio', 0.0)
+        if ratio <= 0:
+            return
+        if importlib.util.find_spec("tomesd") is None:
+            print("Token merging needs the tomesd package, skipping")
+            return
+        import tomesd
+        max_downsample = tome_config.get('max_downsample', 1)
+        # Random merge partitions would make seeded replays non-deterministic
+        tomesd.apply_patch(
+            self.pipe,
+            ratio=min(ratio, 0.75),
+            max_downsample=max_downsample,
+            use_rand=tome_config.get('use_rand', False)
+        )
+        self.token_merging = True
+        # tomesd replaces the transformer block forward; an incompatible diffusers version
+        # would otherwise only fail inside every later generation
+        try:
+            self._unet_smoke_test()
+        except Exception as e:
+            print(f"Token merging disabled: the patched UNet failed a test run ({e!r})")
+            self._remove_token_merging()
+            return
+        blocks = "the highest resolution" if max_downsample <= 1 else f"1x to {max_downsample}x downsampled"
+        print(f"Token merging: ratio {min(ratio, 0.75)} on {blocks} attention blocks")
+
+    def _unet_smoke_test(self):
+        """Run the UNet once at the generation size on random inputs"""
+        unet = self.pipe.unet
+        width, height = self._get_generation_size()
+        sample = torch.randn(1, unet.config.in_channels, height // 8, width // 8, device=self.device, dtype=unet.dtype)
+        context = torch.randn(
+            1, self.pipe.tokenizer.model_max_length, unet.config.cross_attention_dim, device=self.device, dtype=unet.dtype
+        )
+        with torch.inference_mode():
+            unet(sample, torch.tensor(999, device=self.device), encoder_hidden_states=context)
+
+    def _remove_token_merging(self):
+        """Undo the tomesd patch so no patched blocks outlive a reload"""
+        if not self.token_merging:
+            return
+        import tomesd
+        tomesd.remove_patch(self.pipe)
+        self.token_merging = False
+
+    def _install_feature_cache(self):
+        """Wrap the deep UNet blocks so their outputs are reused between refresh steps"""
+        feature_config = self.config.render.get('optimization', {}).get('feature_cache', {})
+        if not feature_config.get('enabled', False):
+            return
+        if self._uses_compile():
+            print("UNet feature cache is not used with compiled models")
+            return
+        self.feature_cache = UNetFeatureCache(feature_config.get('interval', 2)).install(self.pipe.unet)
+        print(f"UNet feature cache: full UNet every {self.feature_cache.interval} steps")
+
+    def _get_sampling_params(self, gen_config):
+        """Return (num_inference_steps, guidance_scale) for the active sampler"""
+        if getattr(self, 'scheduler_name', None) in DISTILLED_SCHEDULERS:
+            distilled = gen_config.get('distilled', {})
+            return distilled.get('num_inference_steps', 4), distilled.get('guidance_scale', 1.0)
+        return gen_config['num_inference_steps'], gen_config['guidance_scale']
+
+    def _get_generation_size(self):
+        """Return the (width, height) to generate at.
+        
+        In upscale mode the image is generated at a fraction of the render size
+        (snapped to the VAE's multiple of 8) and upscaled later on the worker thread.
+        """
+        width, height = self.config.render['width'], self.config.render['height']
+        upscale_config = self.config.render.get('upscale', {})
+        if upscale_config.get('enabled', False):
+            width, height = _scaled_size(width, height, upscale_config.get('generation_scale', 0.75))
+        return width, height
+
+    def _uses_compile(self):
+        """Whether the denoiser is compiled (render.optimization.compile, never for quantized models)"""
+        return self.config.render.get('optimization', {}).get('compile', False) and self.profile.quantization == "none"
+
+    def _optimize_denoiser(self):
+        """Apply the opt-in UNet/ControlNet optimizations from render.optimization.
+        
+        Returns True if any optimization was applied.
+        """
+        opt_config = self.config.render.get('optimization', {})
+        optimized = False
+        # Quantized linear layers have no float weights to fuse and are not tested under torch.compile
+        quantized = self.profile.quantization != "none"
+        
+        if opt_config.get('fuse_qkv', False):
+            if quantized:
+                print("Skipping fused QKV projections: not supported with quantized models")
+            elif self.profile.attention == "xformers":
+                print("Skipping fused QKV projections: not supported with xformers attention")
+            else:
+                self.pipe.unet.fuse_qkv_projections()
+                optimized = True
+        
+        if opt_config.get('channels_last', False):
+            self.pipe.unet.to(memory_format=torch.channels_last)
+            self.pipe.controlnet.to(memory_format=torch.channels_last)
+            optimized = True
+        
+        if opt_config.get('compile', False) and quantized:
+            print("Skipping torch.compile: not supported with quantized models")
+        elif self._uses_compile():
+            mode = opt_config.get('compile_mode', 'reduce-overhead')
+            # Render size is fixed, so compile for static shapes (the warm-up covers both batch sizes).
+            # Graph breaks fall back to eager instead of failing the load.
+            self.pipe.unet = torch.compile(self.pipe.unet, mode=mode, fullgraph=False, dynamic=False)
+            self.pipe.controlnet = torch.compile(self.pipe.controlnet, mode=mode, fullgraph=False, dynamic=False)
+            optimized = True
+        
+        if optimized:
+            print(f"Denoiser optimizations: compile={self._uses_compile()}, "
+                  f"channels_last={opt_config.get('channels_last', False)}, fuse_qkv={opt_config.get('fuse_qkv', False)}")
+        return optimized and opt_config.get('warmup', True)
+
+    def _warmup(self):
+        """Run short generations on a dummy control image so the first real one isn't slow"""
+        start_time = time.time()
+        width, height = self._get_generation_size()
+        control_image = Image.new('RGB', (width, height), tuple(self.config.render['background_color']))
+        gen_config = self.config.render['generation']
+        _, guidance_scale = self._get_sampling_params(gen_config)
+        
+        # With CFG the denoiser sees a batch of 2; steps outside the guidance window run a
+        # batch of 1. Warm up both shapes so neither is first compiled during a real run.
+        guidance_scales = [guidance_scale, 1.0] if guidance_scale > 1 else [guidance_scale]
+        for scale in guidance_scales:
+            if self.feature_cache is not None:
+                self.feature_cache.reset()
+            with torch.inference_mode():
+                self.pipe(
+                    prompt="",
+                    negative_prompt="",
+                    image=control_image,
+                    height=height,
+                    width=width,
+                    num_inference_steps=2,
+                    guidance_scale=scale,
+                    controlnet_conditioning_scale=gen_config['controlnet_conditioning_scale'],
+                    control_guidance_start=gen_config['control_guidance_start'],
+                    control_guidance_end=gen_config['control_guidance_end'],
+                )
+        if self.feature_cache is not None:
+            self.feature_cache.reset()
+        print(f"Pipeline warm-up completed in {time.time() - start_time:.2f}s")
+
+    def _check_checkpoint(self):
+        """Return (compatible, reason) for the configured checkpoint"""
+        catalog = ModelCatalog()
+        catalog.refresh()
+        return catalog.is_compatible(self.config.render['checkpoint'])
+
     def _do_reload_pipeline(self):
         """Internal method to handle the actual pipeline reload"""
         try:
             if self.debug:
                 print("Starting pipeline reload...")
             
-            # Clean up existing pipeline
-            if self.debug:
-                print("Cleaning up old pipeline...")
-            self._cleanup_pipeline()
-            
-            if self.debug:
-                print("Loading new pipeline...")
-            self._load_pipeline()
+            # Stop a running generation and wait for it before tearing down the pipeline
+            self.cancel("reload")
+            with self.generation_lock:
+                # Clean up existing pipeline
+                if self.debug:
+                    print("Cleaning up old pipeline...")
+                self._cleanup_pipeline()
+                
+                if self.debug:
+                    print("Loading new pipeline...")
+                self._load_pipeline()
             
             if self.debug:
                 print("Pipeline reload complete")
@@ -142,6 +583,14 @@ class DiffusionPipeline:
 
     def reload(self, complete_callback=None, error_callback=None):
         """Reload the pipeline with new configuration in a separate thread"""
+        # Reject checkpoints the pipeline can't load before tearing down the current one
+        compatible, reason = self._check_checkpoint()
+        if not compatible:
+            print(f"Not reloading pipeline: {reason}")
+            if error_callback:
+                error_callback(ValueError(reason))
+            return
+        
         self.is_loading = True
         def wrapped_callback():
             self.is_loading = False
@@ -153,47 +602,217 @@ class DiffusionPipeline:
         reload_thread.daemon = True
         reload_thread.start()
 
-    def generate(self, source_image, prompt, negative_prompt=None):
-        """Generate an image using the pipeline"""
+    def _on_progress(self, step, num_steps):
+        self.progress = ('decoding', step, num_steps) if step >= num_steps else ('denoising', step, num_steps)
+
+    def device_memory(self):
+        """Allocated/peak accelerator memory as a short string, or None on CPU"""
+        gib = 1024 ** 3
+        if self.device == "cuda":
+            return f"{torch.cuda.memory_allocated() / gib:.2f} GB allocated, peak {torch.cuda.max_memory_allocated() / gib:.2f} GB"
+        if self.device == "mps":
+            return f"{torch.mps.current_allocated_memory() / gib:.2f} GB allocated"
+        return None
+
+    def cancel(self, reason):
+        """Ask the running generation, if any, to stop after its current step"""
+        token = self.cancel_token
+        if token is not None and token.reason is None:
+            if self.debug:
+                print(f"Cancelling generation: {reason}")
+            token.cancel(reason)
+
+    def generate(self, source_image, prompt, negative_prompt=None, seed=None, gen_config=None, preview_callback=None):
+        """Generate an image using the pipeline.
+        
+        Pass seed and gen_config (a render.generation dict) to reproduce an earlier image.
+        If previews are enabled, preview_callback(image, step, num_steps) receives tiny
+        autoencoder decodes of the intermediate latents.
+        Returns (image, seed). Raises GenerationCancelled if the run is cancelled or
+        exceeds render.generation.deadline.
+        """
+        if gen_config is None:
+            gen_config = self.config.render['generation']
+        token = CancellationToken(gen_config.get('deadline', 0))
+        with self.generation_lock:
+            self.cancel_token = token
+            self.progress = ('encoding prompt', 0, 0)
+            try:
+                return self._generate(source_image, prompt, negative_prompt, seed, gen_config, token, preview_callback)
+            finally:
+                self.cancel_token = None
+                self.progress = ('idle', 0, 0)
+
+    def _generate(self, source_image, prompt, negative_prompt, seed, gen_config, token, preview_callback):
         if self.pipe is None:
             raise RuntimeError("Pipeline not initialized")
 
-        # Get generation settings from config
-        gen_config = self.config.render['generation']
+        num_inference_steps, guidance_scale = self._get_sampling_params(gen_config)
         
-        # Generate random seed
-        generator = torch.Generator(device=self.device)
-        seed = generator.initial_seed()
+        # Use an explicit seed so the image can be reproduced
+        if seed is None:
+            seed = random.randrange(2**32)
+        generator = torch.Generator(device=self.device).manual_seed(seed)
         
         # Compel prompt
-        compel = Compel(tokenizer=self.pipe.tokenizer, text_encoder=self.pipe.text_encoder)
+        text_encoder = self.backend.text_encoder if self.backend is not None else self.pipe.text_encoder
+        compel = Compel(tokenizer=self.pipe.tokenizer, text_encoder=text_encoder)
         conditioning = compel(prompt)
 
-        # Handle negative prompt
-        if negative_prompt is None:
-            negative_prompt = self.config.prompts['negative_prompt']
-        negative_conditioning = compel(negative_prompt)
-        
-        # Pad conditioning tensors
-        [conditioning, negative_conditioning] = compel.pad_conditioning_tensors_to_same_length([conditioning, negative_conditioning])
+        # Handle negative prompt (unused without classifier-free guidance)
+        if guidance_scale > 1:
+            if negative_prompt is None:
+                negative_prompt = self.config.prompts['negative_prompt']
+            negative_conditioning = compel(negative_prompt)
+            
+            # Pad conditioning tensors
+            [conditioning, negative_conditioning] = compel.pad_conditioning_tensors_to_same_length([conditioning, negative_conditioning])
+            negative_conditioning = negative_conditioning.to(self.device)
+        else:
+            negative_conditioning = None
         
         # Move conditioning tensors to the correct device
         conditioning = conditioning.to(self.device)
-        negative_conditioning = negative_conditioning.to(self.device)
         
-        # Generate image
-        result = self.pipe(
+        if self.backend is not None:
+            # Exported graphs only cover full generations (no continuity, previews or step hooks)
+            token.check()
+            self.progress = ('denoising', 0, num_inference_steps)
+            image = self.backend.generate(
+                source_image, conditioning, negative_conditioning, gen_config,
+                num_inference_steps, guidance_scale, generator, token
+            )
+            self.last_generation_mode = 'txt2img'
+            return image, seed
+        
+        # Continue from the previous background's latents when continuity mode allows it
+        width, height = self._get_generation_size()
+        continuity_config = gen_config.get('continuity', {})
+        continuity = self._can_continue(continuity_config, width, height)
+        if continuity:
+            pipe = self._get_img2img_pipe()
+            strength = continuity_config.get('strength', 0.6)
+            steps_run = max(1, int(num_inference_steps * strength))
+            control_key = "control_image"
+        else:
+            pipe = self.pipe
+            steps_run = num_inference_steps
+            control_key = "image"
+        
+        if self.controlnet_cache is not None:
+            self.controlnet_cache.key = hash_control_image(source_image)
+        
+        # Per-step hooks; cancellation runs first so a stopped run does no further work
+        step_callbacks = StepCallbacks([CancellationCallback(token), ProgressCallback(self._on_progress)])
+        guidance_window = None
+        guidance_start = gen_config.get('guidance_start', 0.0)
+        guidance_end = gen_config.get('guidance_end', 1.0)
+        if guidance_scale > 1 and (guidance_start > 0 or guidance_end < 1):
+            # Only run classifier-free guidance inside the configured window of steps
+            guidance_window = GuidanceWindowCallback(guidance_scale, guidance_start, guidance_end, steps_run, control_key)
+            step_callbacks.add(guidance_window)
+        latent_capture = None
+        if continuity_config.get('enabled', False):
+            latent_capture = LatentCaptureCallback()
+            step_callbacks.add(latent_capture)
+        preview_config = self.config.render.get('preview', {})
+        if preview_callback is not None and self.tiny_vae is not None and preview_config.get('enabled', False):
+            step_callbacks.add(PreviewCallback(self.tiny_vae, preview_config.get('every_n_steps', 2), preview_callback))
+        step_timing = None
+        if self.device == "cpu" or self.debug:
+            step_timing = StepTimingCallback()
+            step_callbacks.add(step_timing)
+        pipeline_kwargs = step_callbacks.pipeline_kwargs(pipe)
+        if guidance_window in step_callbacks.callbacks:
+            guidance_scale = guidance_window.initial_guidance_scale()
+        
+        generation_kwargs = dict(
             prompt_embeds=conditioning,
             negative_prompt_embeds=negative_conditioning,
-            image=source_image,
-            height=self.config.render['height'],
-            width=self.config.render['width'],
+            height=height,
+            width=width,
             controlnet_conditioning_scale=gen_config['controlnet_conditioning_scale'],
-            num_inference_steps=gen_config['num_inference_steps'],
-            guidance_scale=gen_config['guidance_scale'],
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
             control_guidance_start=gen_config['control_guidance_start'],
             control_guidance_end=gen_config['control_guidance_end'],
-            generator=generator
+            generator=generator,
+            **pipeline_kwargs
         )
+        
+        # Generate image (the control image is resized to the generation size by the pipeline)
+        token.check()
+        self.progress = ('denoising', 0, steps_run)
+        if self.feature_cache is not None:
+            self.feature_cache.reset()
+            self.feature_cache.reset_stats()
+        if step_timing is not None:
+            step_timing.start()
+        cancelled = None
+        try:
+            if continuity:
+                result = pipe(
+                    image=self.previous_latents,
+                    control_image=source_image,
+                    strength=strength,
+                    **generation_kwargs
+                )
+            else:
+                result = pipe(image=source_image, **generation_kwargs)
+        except GenerationCancelled as e:
+            # Re-raised outside the handler so the traceback doesn't keep the run's tensors alive
+            cancelled = GenerationCancelled(e.reason, e.step, e.num_steps)
+        if cancelled is not None:
+            self._release_cancelled_run()
+            raise cancelled
+        
+        if continuity:
+            self.continuity_count += 1
+            self.last_generation_mode = 'img2img'
+            if self.debug:
+                print(f"Continuity update {self.continuity_count} from previous latents (strength {strength}, {steps_run} steps)")
+        else:
+            self.continuity_count = 0
+            self.last_generation_mode = 'txt2img'
+        
+        if latent_capture is not None:
+            self.previous_latents = latent_capture.latents
+        
+        if step_timing is not None:
+            print(f"Denoising: {step_timing.summary()}")
+        
+        if self.feature_cache is not None:
+            self.feature_cache.reset()  # don't hold the deep features between generations
+            if self.debug:
+                print(f"UNet feature cache: {self.feature_cache.cached_steps} cached steps, {self.feature_cache.full_steps} full steps")
+        
+        if self.controlnet_cache is not None:
+            self.controlnet_cache.key = None
+            if self.debug:
+                print(f"ControlNet conditioning cache: {self.controlnet_cache.hits} hits, {self.controlnet_cache.misses} misses")
+
+        return result.images[0], seed
+
+    def _release_cancelled_run(self):
+        """Free the memory of a run that was stopped part-way"""
+        if self.controlnet_cache is not None:
+            self.controlnet_cache.key = None
+        if self.feature_cache is not None:
+            self.feature_cache.reset()
+        self._empty_cache()
+
+    def _can_continue(self, continuity_config, width, height):
+        """Whether the next image can be generated img2img-style from the previous latents"""
+        if not continuity_config.get('enabled', False) or self.previous_latents is None:
+            return False
+        # Start from noise periodically so the sequence doesn't drift too far
+        if self.continuity_count >= continuity_config.get('refresh_every', 10):
+            return False
+        # Latents from a different generation size can't be reused
+        return tuple(self.previous_latents.shape[-2:]) == (height // 8, width // 8)
 
-        return result.images[0], seed 
\ No newline at end of file
+    def _get_img2img_pipe(self):
+        """Img2img ControlNet pipeline sharing weights, scheduler and optimizations with self.pipe"""
+        if self.img2img_pipe is None:
+            self.img2img_pipe = StableDiffusionControlNetImg2ImgPipeline.from_pipe(self.pipe)
+        return self.img2img_pipe
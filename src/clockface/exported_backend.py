@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import hashlib
+
+import numpy as np
+import torch
+from transformers.modeling_outputs import BaseModelOutput
+
+from .step_callbacks import GuidanceWindowCallback
+
+# Graph runtimes selectable via render.backend ('torch' runs the diffusers pipeline directly)
+EXPORTED_BACKENDS = ("onnxruntime", "openvino")
+
+class _TextEncoderGraph(torch.nn.Module):
+    def __init__(self, text_encoder):
+        super().__init__()
+        self.text_encoder = text_encoder
+
+    def forward(self, input_ids, attention_mask):
+        return self.text_encoder(input_ids, attention_mask=attention_mask, return_dict=True).last_hidden_state
+
+class _DenoiserGraph(torch.nn.Module):
+    """ControlNet and UNet as one graph: one runtime call per denoising step"""
+    def __init__(self, unet, controlnet):
+        super().__init__()
+        self.unet = unet
+        self.controlnet = controlnet
+
+    def forward(self, sample, timestep, encoder_hidden_states, controlnet_cond, conditioning_scale):
+        down_residuals, mid_residual = self.controlnet(
+            sample,
+            timestep,
+            encoder_hidden_states=encoder_hidden_states,
+            controlnet_cond=controlnet_cond,
+            conditioning_scale=conditioning_scale,
+            return_dict=False,
+        )
+        return self.unet(
+            sample,
+            timestep,
+            encoder_hidden_states=encoder_hidden_states,
+            down_block_additional_residuals=down_residuals,
+            mid_block_additional_residual=mid_residual,
+            return_dict=False,
+        )[0]
+
+class _VaeDecoderGraph(torch.nn.Module):
+    def __init__(self, vae):
+        super().__init__()
+        self.vae = vae
+
+    def forward(self, latents):
+        return self.vae.decode(latents, return_dict=False)[0]
+
+class _Session:
+    """A loaded graph in ONNX Runtime or OpenVINO, called with numpy inputs"""
+    def __init__(self, runtime, path, num_threads=None, providers=None):
+        self.runtime = runtime
+        if runtime == "openvino":
+            import openvino as ov
+            properties = {"INFERENCE_NUM_THREADS": num_threads} if num_threads else {}
+            self.model = ov.Core().compile_model(path, "CPU", properties)
+        else:
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if num_threads:
+                options.intra_op_num_threads = num_threads
+            self.model = ort.InferenceSession(path, options, providers=providers or ["CPUExecutionProvider"])
+
+    def run(self, inputs):
+        """Run the graph and return its first output"""
+        if self.runtime == "openvino":
+            return self.model(inputs)[self.model.output(0)]
+        return self.model.run(None, inputs)[0]
+
+class ExportedTextEncoder(torch.nn.Module):
+    """Stands in for the CLIP text encoder (e.g. inside Compel), running the exported graph"""
+    def __init__(self, session, config):
+        super().__init__()
+        self.session = session
+        self.config = config
+
+    @property
+    def device(self):
+        return torch.device("cpu")
+
+    @property
+    def dtype(self):
+        return torch.float32
+
+    def forward(self, input_ids, attention_mask=None, **kwargs):
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        hidden_states = self.session.run({
+            "input_ids": input_ids.cpu().numpy().astype(np.int64),
+            "attention_mask": attention_mask.cpu().numpy().astype(np.int64),
+        })
+        return BaseModelOutput(last_hidden_state=torch.from_numpy(hidden_states))
+
+class ExportedBackend:
+    """Runs ControlNet generation through graphs exported from the loaded pipeline.
+
+    The text encoder, ControlNet+UNet and VAE decoder are exported to ONNX once for the
+    fixed generation size and stored under a cache directory keyed by checkpoint, models
+    and settings, then executed with ONNX Runtime or OpenVINO. The diffusers scheduler,
+    tokenizer and image processors are still used from the pipeline.
+    """
+    def __init__(self, pipe, runtime, width, height, cache_dir, cache_key, num_threads=None,
+                 providers=None, opset=17, debug=False):
+        self.pipe = pipe
+        self.runtime = runtime
+        self.width = width
+        self.height = height
+        self.num_threads = num_threads
+        self.debug = debug
+        self.directory = os.path.join(cache_dir, f"{cache_key}_{width}x{height}")
+
+        self._export(opset)
+        self.text_encoder = ExportedTextEncoder(self._load("text_encoder", providers), pipe.text_encoder.config)
+        self.denoiser = self._load("denoiser", providers)
+        self.vae_decoder = self._load("vae_decoder", providers)
+        self.vae_scaling_factor = pipe.vae.config.get("scaling_factor", 1.0)
+
+    @staticmethod
+    def cache_key(settings):
+        """Stable key for the exported graphs of a given set of model settings"""
+        return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+    def _path(self, name):
+        return os.path.join(self.directory, name, "model.onnx")
+
+    def _load(self, name, providers):
+        return _Session(self.runtime, self._path(name), self.num_threads, providers)
+
+    def _export(self, opset):
+        """Export any graph not yet in the cache"""
+        pipe = self.pipe
+        latent_height, latent_width = self.height // 8, self.width // 8
+        text_length = pipe.tokenizer.model_max_length
+        hidden_size = pipe.text_encoder.config.hidden_size
+        graphs = {
+            "text_encoder": (
+                _TextEncoderGraph(pipe.text_encoder),
+                (torch.ones(1, text_length, dtype=torch.int64), torch.ones(1, text_length, dtype=torch.int64)),
+                ["input_ids", "attention_mask"],
+                {"input_ids": {0: "batch"}, "attention_mask": {0: "batch"}},
+            ),
+            "denoiser": (
+                _DenoiserGraph(pipe.unet, pipe.controlnet),
+                (
+                    torch.randn(2, 4, latent_height, latent_width),
+                    torch.tensor(999.0),
+                    torch.randn(2, text_length, hidden_size),
+                    torch.rand(2, 3, self.height, self.width),
+                    torch.tensor(1.0),
+                ),
+                ["sample", "timestep", "encoder_hidden_states", "controlnet_cond", "conditioning_scale"],
+                {"sample": {0: "batch"}, "encoder_hidden_states": {0: "batch"}, "controlnet_cond": {0: "batch"}},
+            ),
+            "vae_decoder": (
+                _VaeDecoderGraph(pipe.vae),
+                (torch.randn(1, 4, latent_height, latent_width),),
+                ["latents"],
+                {},
+            ),
+        }
+        for name, (module, args, input_names, dynamic_axes) in graphs.items():
+            path = self._path(name)
+            if os.path.exists(path):
+                continue
+            start_time = time.time()
+            print(f"Exporting {name} graph for {self.width}x{self.height} (one-time, cached in {self.directory})")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.tmp"
+            with torch.no_grad():
+                torch.onnx.export(
+                    module.float().cpu().eval(),
+                    args,
+                    temp_path,
+                    input_names=input_names,
+                    output_names=["output"],
+                    dynamic_axes=dynamic_axes,
+                    opset_version=opset,
+                    do_constant_folding=True,
+                )
+            # Large graphs keep their weights in external data files next to the model
+            os.replace(temp_path, path)
+            print(f"Exported {name} in {time.time() - start_time:.1f}s")
+
+    def generate(self, control_image, prompt_embeds, negative_prompt_embeds, gen_config, num_inference_steps,
+                 guidance_scale, generator, token):
+        """Denoise and decode one image. Returns a PIL image."""
+        pipe = self.pipe
+        scheduler = pipe.scheduler
+        scheduler.set_timesteps(num_inference_steps, device="cpu")
+        timesteps = scheduler.timesteps
+        num_steps = len(timesteps)
+
+        control = pipe.control_image_processor.preprocess(control_image, height=self.height, width=self.width)
+        control = control.float().numpy()
+
+        latents = torch.randn((1, 4, self.height // 8, self.width // 8), generator=generator, dtype=torch.float32)
+        latents = latents * scheduler.init_noise_sigma
+
+        # Classifier-free guidance only runs inside the configured window of steps
+        cfg = negative_prompt_embeds is not None and guidance_scale > 1
+        window = GuidanceWindowCallback(
+            guidance_scale, gen_config.get('guidance_start', 0.0), gen_config.get('guidance_end', 1.0), num_steps
+        )
+        conditioning = prompt_embeds.float().cpu().numpy()
+        both = np.concatenate([negative_prompt_embeds.float().cpu().numpy(), conditioning]) if cfg else None
+
+        control_start = gen_config['control_guidance_start']
+        control_end = gen_config['control_guidance_end']
+        conditioning_scale = gen_config['controlnet_conditioning_scale']
+
+        start_time = time.perf_counter()
+        for i, t in enumerate(timesteps):
+            token.check(i, num_steps)
+            run_cfg = cfg and window.is_active(i, num_steps)
+            model_input = torch.cat([latents] * 2) if run_cfg else latents
+            model_input = scheduler.scale_model_input(model_input, t)
+            # Same ControlNet step window as the diffusers pipeline
+            keep = not (i / num_steps < control_start or (i + 1) / num_steps > control_end)
+
+            noise_pred = torch.from_numpy(self.denoiser.run({
+                "sample": model_input.numpy(),
+                "timestep": np.array(float(t), dtype=np.float32),
+                "encoder_hidden_states": both if run_cfg else conditioning,
+                "controlnet_cond": np.concatenate([control] * 2) if run_cfg else control,
+                "conditioning_scale": np.array(conditioning_scale if keep else 0.0, dtype=np.float32),
+            }))
+            if run_cfg:
+                noise_uncond, noise_text = noise_pred.chunk(2)
+                noise_pred = noise_uncond + guidance_scale * (noise_text - noise_uncond)
+            latents = scheduler.step(noise_pred, t, latents, generator=generator, return_dict=False)[0]
+        token.check(num_steps, num_steps)
+        print(f"Denoising ({self.runtime}): {num_steps} steps, {(time.perf_counter() - start_time) / num_steps:.2f}s/step")
+
+        image = torch.from_numpy(self.vae_decoder.run({"latents": (latents / self.vae_scaling_factor).numpy()}))
+        return pipe.image_processor.postprocess(image, output_type="pil")[0]
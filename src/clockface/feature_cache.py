@@ -0,0 +1,95 @@
+import torch
+
+class _CachedBlock(torch.nn.Module):
+    """Wraps a deep UNet block and returns its previous output on cached steps"""
+    def __init__(self, block, cache):
+        super().__init__()
+        self.block = block
+        self.cache = cache
+        self.output = None
+
+    def __getattr__(self, name):
+        # The UNet forward reads block attributes such as has_cross_attention and resnets
+        try:
+            return super().__getattr__(name)
+        except AttributeError:
+            return getattr(self._modules['block'], name)
+
+    def forward(self, *args, **kwargs):
+        if self.cache.reuse and self.output is not None:
+            return self.output
+        self.output = self.block(*args, **kwargs)
+        return self.output
+
+class UNetFeatureCache:
+    """DeepCache-style reuse of deep UNet features across denoising steps.
+
+    Adjacent steps produce very similar high-level features. Every `interval` steps the
+    UNet runs in full and the outputs of its deep blocks (all down blocks but the first,
+    the mid block and all up blocks but the last) are kept. On the steps in between only
+    the shallowest down and up blocks run, on top of the cached deep features. The
+    ControlNet still runs every step.
+    """
+    def __init__(self, interval=2):
+        self.interval = max(1, interval)
+        self.unet = None
+        self.blocks = []
+        self.hook = None
+        self.step = 0
+        self.reuse = False
+        self.batch_shape = None
+        self.cached_steps = 0
+        self.full_steps = 0
+
+    def install(self, unet):
+        self.unet = unet
+        for blocks, indices in (
+            (unet.down_blocks, range(1, len(unet.down_blocks))),
+            (unet.up_blocks, range(len(unet.up_blocks) - 1)),
+        ):
+            for i in indices:
+                blocks[i] = _CachedBlock(blocks[i], self)
+                self.blocks.append(blocks[i])
+        unet.mid_block = _CachedBlock(unet.mid_block, self)
+        self.blocks.append(unet.mid_block)
+        self.hook = unet.register_forward_pre_hook(self._begin_step)
+        return self
+
+    def remove(self):
+        """Restore the original UNet blocks"""
+        if self.unet is None:
+            return
+        for blocks in (self.unet.down_blocks, self.unet.up_blocks):
+            for i, block in enumerate(blocks):
+                if isinstance(block, _CachedBlock):
+                    blocks[i] = block.block
+        if isinstance(self.unet.mid_block, _CachedBlock):
+            self.unet.mid_block = self.unet.mid_block.block
+        self.hook.remove()
+        self.unet = None
+        self.blocks = []
+
+    def reset(self):
+        """Start a new generation: the next UNet call recomputes everything"""
+        self.step = 0
+        self.reuse = False
+        self.batch_shape = None
+        for block in self.blocks:
+            block.output = None
+
+    def reset_stats(self):
+        """Zero the cached/full step counts (at the start of each generation)"""
+        self.cached_steps = 0
+        self.full_steps = 0
+
+    def _begin_step(self, module, args):
+        sample = args[0] if args else None
+        shape = tuple(sample.shape) if sample is not None else None
+        # A batch change (e.g. CFG switching on or off) invalidates the cached features
+        self.reuse = self.step % self.interval != 0 and shape == self.batch_shape
+        self.batch_shape = shape
+        self.step += 1
+        if self.reuse:
+            self.cached_steps += 1
+        else:
+            self.full_steps += 1
@@ -0,0 +1,34 @@
+import threading
+
+class BackgroundFrame:
+    """A finished background, ready for display, with its seconds hand colour and metadata"""
+    __slots__ = ('background_surface', 'display_background', 'color', 'metadata')
+
+    def __init__(self, background_surface, display_background, color, metadata=None):
+        self.background_surface = background_surface
+        self.display_background = display_background
+        self.color = color
+        self.metadata = metadata
+
+class FrameMailbox:
+    """Single-slot handoff of finished frames from the generation worker to the render loop.
+
+    The worker publishes a complete frame; the render loop takes it at the start of a
+    frame. Publishing over an unclaimed frame replaces it, so the render loop only ever
+    sees the newest one. The lock only guards swapping the slot, never any rendering.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+
+    def publish(self, frame):
+        with self._lock:
+            replaced = self._frame is not None
+            self._frame = frame
+        return replaced
+
+    def take(self):
+        """Return the pending frame, or None, and empty the slot"""
+        with self._lock:
+            frame, self._frame = self._frame, None
+        return frame
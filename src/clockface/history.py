@@ -0,0 +1,180 @@
+import os
+import json
+import sqlite3
+import threading
+
+from PIL import Image
+
+from .controlnet_cache import hash_control_image
+
+class GenerationHistory:
+    """Indexed store of recent generations for later lookup and replay.
+
+    Records live in a SQLite database; control images are stored once per content hash
+    next to it so a generation can be reproduced exactly. Only the newest max_records
+    records are kept (0 keeps everything); control images no record uses are deleted.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS generations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            status TEXT NOT NULL,
+            prompt TEXT,
+            negative_prompt TEXT,
+            seed INTEGER,
+            checkpoint TEXT,
+            mode TEXT,
+            generation_config TEXT,
+            pipeline_settings TEXT,
+            control_hash TEXT,
+            enhancement_time REAL,
+            generation_time REAL,
+            total_time REAL,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_generations_timestamp ON generations (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_generations_checkpoint ON generations (checkpoint);
+        CREATE INDEX IF NOT EXISTS idx_generations_seed ON generations (seed);
+        CREATE INDEX IF NOT EXISTS idx_generations_control_hash ON generations (control_hash);
+    """
+    FIELDS = (
+        'timestamp', 'status', 'prompt', 'negative_prompt', 'seed', 'checkpoint', 'mode',
+        'generation_config', 'pipeline_settings', 'control_hash', 'enhancement_time', 'generation_time', 'total_time', 'error'
+    )
+    JSON_FIELDS = ('generation_config', 'pipeline_settings')
+
+    # Columns added after the first release, created on databases that predate them
+    MIGRATIONS = {'pipeline_settings': 'TEXT'}
+
+    def __init__(self, directory='history', max_records=2000):
+        self.directory = directory
+        self.max_records = max_records
+        self.controls_dir = os.path.join(directory, 'controls')
+        os.makedirs(self.controls_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        # Written from the generation worker thread, read from anywhere
+        self.connection = sqlite3.connect(os.path.join(directory, 'history.sqlite3'), check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock:
+            self.connection.executescript(self.SCHEMA)
+            columns = {row['name'] for row in self.connection.execute("PRAGMA table_info(generations)")}
+            for column, column_type in self.MIGRATIONS.items():
+                if column not in columns:
+                    self.connection.execute(f"ALTER TABLE generations ADD COLUMN {column} {column_type}")
+            self.connection.commit()
+
+    def record(self, metadata, control_image=None):
+        """Append a generation record and return its id.
+
+        metadata holds the generation metadata dict (prompt, seed, checkpoint, timestamp,
+        generation_config, ...) plus optional timing fields and status/error.
+        """
+        control_hash = None
+        if control_image is not None:
+            control_hash = self._store_control_image(control_image)
+
+        values = dict(metadata)
+        values.setdefault('status', 'ok')
+        values['control_hash'] = control_hash
+        for field in self.JSON_FIELDS:
+            if values.get(field) is not None:
+                values[field] = json.dumps(values[field])
+        row = [values.get(field) for field in self.FIELDS]
+
+        with self.lock:
+            cursor = self.connection.execute(
+                f"INSERT INTO generations ({', '.join(self.FIELDS)}) VALUES ({', '.join('?' for _ in self.FIELDS)})",
+                row
+            )
+            self.connection.commit()
+            record_id = cursor.lastrowid
+            if self.max_records > 0:
+                self._prune()
+            return record_id
+
+    def _prune(self):
+        """Delete records beyond max_records and control images no remaining record uses (lock held)"""
+        cutoff = self.connection.execute(
+            "SELECT id FROM generations ORDER BY id DESC LIMIT 1 OFFSET ?", (self.max_records,)
+        ).fetchone()
+        if cutoff is None:
+            return
+        hashes = {row['control_hash'] for row in self.connection.execute(
+            "SELECT DISTINCT control_hash FROM generations WHERE id <= ? AND control_hash IS NOT NULL", (cutoff['id'],)
+        )}
+        self.connection.execute("DELETE FROM generations WHERE id <= ?", (cutoff['id'],))
+        self.connection.commit()
+        for control_hash in hashes:
+            if self.connection.execute(
+                "SELECT 1 FROM generations WHERE control_hash = ? LIMIT 1", (control_hash,)
+            ).fetchone() is None:
+                try:
+                    os.remove(self._control_path(control_hash))
+                except OSError:
+                    pass
+
+    def get(self, record_id):
+        """Get a single record as a dict, or None"""
+        with self.lock:
+            row = self.connection.execute("SELECT * FROM generations WHERE id = ?", (record_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def recent(self, limit=20):
+        """Most recent records first"""
+        with self.lock:
+            rows = self.connection.execute("SELECT * FROM generations ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def find(self, checkpoint=None, seed=None, prompt_contains=None, status='ok', limit=100):
+        """Search records by checkpoint, seed, prompt substring and status"""
+        clauses, params = [], []
+        if checkpoint is not None:
+            clauses.append("checkpoint = ?")
+            params.append(checkpoint)
+        if seed is not None:
+            clauses.append("seed = ?")
+            params.append(seed)
+        if prompt_contains:
+            clauses.append("prompt LIKE ?")
+            params.append(f"%{prompt_contains}%")
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT * FROM generations {where} ORDER BY id DESC LIMIT ?", (*params, limit)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def load_control_image(self, record):
+        """Load the control image stored for a record, or None"""
+        if not record.get('control_hash'):
+            return None
+        path = self._control_path(record['control_hash'])
+        if not os.path.exists(path):
+            return None
+        return Image.open(path).convert('RGB')
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def _store_control_image(self, control_image):
+        """Store a control image once per content hash"""
+        control_hash = hash_control_image(control_image)
+        path = self._control_path(control_hash)
+        if not os.path.exists(path):
+            control_image.save(path, compress_level=1)
+        return control_hash
+
+    def _control_path(self, control_hash):
+        return os.path.join(self.controls_dir, f"{control_hash}.png")
+
+    @staticmethod
+    def _to_dict(row):
+        record = dict(row)
+        for field in GenerationHistory.JSON_FIELDS:
+            if record.get(field):
+                record[field] = json.loads(record[field])
+        return record
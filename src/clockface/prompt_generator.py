@@ -4,7 +4,7 @@ from abc import ABC, abstractmethod
 import torch
 from ..config import Config
 from transformers import AutoModelForCausalLM, AutoTokenizer
-from ..utils.device_utils import get_best_device
+from ..utils.device_utils import get_best_device, get_execution_profile
 import time
 
 class PromptStrategy(ABC):
@@ -42,16 +42,9 @@ class EnhancedPromptStrategy(PromptStrategy):
         if self.model is None or self.tokenizer is None:
             enhancer_config = self.prompt_config['enhancer']
             device = get_best_device()
-            
-            if device == "cuda":
-                model_kwargs = {
-                    "attn_implementation": "flash_attention_2",
-                    "torch_dtype": torch.float16,
-                    "device_map": "auto",
-                    "use_cache": True,
-                }
-            else:
-                model_kwargs = {}
+            profile = get_execution_profile(device)
+            model_kwargs = profile.transformers_kwargs()
+            print(f"Prompt enhancer profile: {profile.describe()}, attention={model_kwargs['attn_implementation']}")
             
             self.model = AutoModelForCausalLM.from_pretrained(
                 enhancer_config['model'],
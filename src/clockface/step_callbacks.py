@@ -0,0 +1,216 @@
+import time
+import threading
+
+import torch
+from PIL import Image
+
+class StepCallback:
+    """Base class for hooks that run at the end of each denoising step"""
+    # Pipeline tensors this callback needs to read or replace
+    tensor_inputs = []
+
+    def on_step_end(self, pipe, step_index, timestep, callback_kwargs):
+        """Called after each step. Returns a dict of tensors to replace in the pipeline"""
+        return {}
+
+class StepCallbacks:
+    """Combines several step callbacks into the single callback_on_step_end diffusers accepts"""
+    def __init__(self, callbacks=None):
+        self.callbacks = list(callbacks or [])
+
+    def add(self, callback):
+        self.callbacks.append(callback)
+
+    def pipeline_kwargs(self, pipe):
+        """Keyword arguments to pass to the diffusers pipeline call.
+
+        Callbacks that need tensors the pipeline does not expose are dropped.
+        """
+        supported = set(getattr(pipe, '_callback_tensor_inputs', []))
+        usable = []
+        for callback in self.callbacks:
+            missing = set(callback.tensor_inputs) - supported
+            if missing:
+                print(f"{type(callback).__name__} disabled: pipeline does not expose {', '.join(sorted(missing))}")
+                continue
+            usable.append(callback)
+        self.callbacks = usable
+
+        if not self.callbacks:
+            return {}
+        tensor_inputs = sorted({name for callback in self.callbacks for name in callback.tensor_inputs})
+        return {
+            'callback_on_step_end': self,
+            'callback_on_step_end_tensor_inputs': tensor_inputs,
+        }
+
+    def __call__(self, pipe, step_index, timestep, callback_kwargs):
+        for callback in self.callbacks:
+            updates = callback.on_step_end(pipe, step_index, timestep, callback_kwargs)
+            if updates:
+                callback_kwargs.update(updates)
+        return callback_kwargs
+
+class GuidanceWindowCallback(StepCallback):
+    """Run classifier-free guidance only for a window of the denoising steps.
+
+    Uses the same step windowing as control_guidance_start/end. Outside the window the
+    unconditional branch is dropped, halving the UNet and ControlNet batch.
+    """
+    def __init__(self, guidance_scale, start, end, num_steps, control_key="image"):
+        # The ControlNet conditioning is 'image' in txt2img and 'control_image' in img2img pipelines
+        self.control_key = control_key
+        self.tensor_inputs = ["prompt_embeds", "negative_prompt_embeds", control_key]
+        self.guidance_scale = guidance_scale
+        self.start = start
+        self.end = end
+        self.num_steps = num_steps
+        self.enabled = self.is_active(0, num_steps)
+
+    def is_active(self, step_index, num_steps):
+        """Whether CFG runs for the given step"""
+        return not (step_index / num_steps < self.start or (step_index + 1) / num_steps > self.end)
+
+    def initial_guidance_scale(self):
+        """Guidance scale to start the pipeline with (<= 1 disables CFG for the first step)"""
+        return self.guidance_scale if self.enabled else 1.0
+
+    def on_step_end(self, pipe, step_index, timestep, callback_kwargs):
+        num_steps = getattr(pipe, 'num_timesteps', None) or self.num_steps
+        next_step = step_index + 1
+        if next_step >= num_steps:
+            return {}
+
+        active = self.is_active(next_step, num_steps)
+        if active == self.enabled:
+            return {}
+        self.enabled = active
+
+        prompt_embeds = callback_kwargs["prompt_embeds"]
+        image = callback_kwargs[self.control_key]
+        if active:
+            # Re-attach the unconditional branch
+            pipe._guidance_scale = self.guidance_scale
+            return {
+                "prompt_embeds": torch.cat([callback_kwargs["negative_prompt_embeds"], prompt_embeds]),
+                self.control_key: torch.cat([image] * 2),
+            }
+
+        # Keep only the conditional half of the batch
+        pipe._guidance_scale = 1.0
+        return {
+            "prompt_embeds": prompt_embeds.chunk(2)[-1],
+            self.control_key: image.chunk(2)[-1],
+        }
+
+class StepTimingCallback(StepCallback):
+    """Measure the wall time of each denoising step"""
+    def __init__(self):
+        self.step_times = []
+        self._last = time.perf_counter()
+
+    def start(self):
+        self._last = time.perf_counter()
+
+    def on_step_end(self, pipe, step_index, timestep, callback_kwargs):
+        now = time.perf_counter()
+        self.step_times.append(now - self._last)
+        self._last = now
+        return {}
+
+    def summary(self):
+        if not self.step_times:
+            return "no steps"
+        average = sum(self.step_times) / len(self.step_times)
+        return f"{len(self.step_times)} steps, {average:.2f}s/step (first {self.step_times[0]:.2f}s, slowest {max(self.step_times):.2f}s)"
+
+class ProgressCallback(StepCallback):
+    """Report (step, num_steps) after each denoising step"""
+    def __init__(self, on_progress):
+        self.on_progress = on_progress
+
+    def on_step_end(self, pipe, step_index, timestep, callback_kwargs):
+        self.on_progress(step_index + 1, pipe.num_timesteps)
+        return {}
+
+class LatentCaptureCallback(StepCallback):
+    """Keep the final latents of a run, e.g. to continue the next image from them"""
+    tensor_inputs = ["latents"]
+
+    def __init__(self):
+        self.latents = None
+
+    def on_step_end(self, pipe, step_index, timestep, callback_kwargs):
+        if step_index == pipe.num_timesteps - 1:
+            self.latents = callback_kwargs["latents"].detach().clone()
+        return {}
+
+class PreviewCallback(StepCallback):
+    """Decode intermediate latents with a tiny autoencoder for a progressive preview"""
+    tensor_inputs = ["latents"]
+
+    def __init__(self, decoder, every_n_steps, on_preview):
+        self.decoder = decoder
+        self.every_n_steps = max(1, every_n_steps)
+        self.on_preview = on_preview
+
+    def on_step_end(self, pipe, step_index, timestep, callback_kwargs):
+        step = step_index + 1
+        num_steps = pipe.num_timesteps
+        # The final image follows right after the last step
+        if step % self.every_n_steps or step >= num_steps:
+            return {}
+        latents = callback_kwargs["latents"]
+        with torch.no_grad():
+            # TAESD works on the scaled latents the UNet produces and outputs [-1, 1]
+            decoded = self.decoder.decode(latents.to(self.decoder.dtype)).sample[0]
+        array = ((decoded.float() / 2 + 0.5).clamp(0, 1) * 255).round().to(torch.uint8)
+        self.on_preview(Image.fromarray(array.permute(1, 2, 0).cpu().numpy()), step, num_steps)
+        return {}
+
+class GenerationCancelled(Exception):
+    """Raised when a diffusion run is stopped between steps"""
+    def __init__(self, reason, step=None, num_steps=None):
+        self.reason = reason
+        self.step = step
+        self.num_steps = num_steps
+        where = f" after step {step}/{num_steps}" if step is not None else " before the first step"
+        super().__init__(f"Generation cancelled ({reason}){where}")
+
+class CancellationToken:
+    """Thread-safe stop request for a single generation, with an optional deadline"""
+    def __init__(self, deadline=None):
+        self.deadline = time.time() + deadline if deadline else None
+        self._event = threading.Event()
+        self.reason = None
+
+    def cancel(self, reason):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def should_stop(self):
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.time() >= self.deadline:
+            self.cancel("deadline")
+            return True
+        return False
+
+    def check(self, step=None, num_steps=None):
+        """Raise GenerationCancelled if the run should stop"""
+        if self.should_stop():
+            raise GenerationCancelled(self.reason, step, num_steps)
+
+class CancellationCallback(StepCallback):
+    """Stop a run at step granularity when its cancellation token fires.
+
+    Raising from the step callback aborts the pipeline call before the remaining steps
+    and the VAE decode, so the GPU is free for the next run right away.
+    """
+    def __init__(self, token):
+        self.token = token
+
+    def on_step_end(self, pipe, step_index, timestep, callback_kwargs):
+        self.token.check(step_index + 1, getattr(pipe, 'num_timesteps', None))
+        return {}
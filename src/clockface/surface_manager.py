@@ -1,18 +1,20 @@
 import pygame
 import cv2
 import numpy as np
-import json
 import os
 import time
 from PIL import Image
-from datetime import datetime
 from ..utils.image_utils import (
     scale_pil_image_to_display,
+    upscale_pil_image,
     pil_to_cv2,
     cv2_to_surface,
     morph_transition,
-    save_debug_image
+    surface_to_pil
 )
+from ..utils.image_writer import ImageWriter
+from ..utils.time_source import get_time_source
+from .frame_mailbox import BackgroundFrame
 from ..config import Config
 
 class SurfaceManager:
@@ -30,9 +32,15 @@ class SurfaceManager:
         
         # Initialize surfaces
         self.hands_surface = None
-        self.background_surface = None
+        self.display_hands = None  # hands scaled to the display, shown until the first background
+        self.background_surface = None  # generated background at generation resolution
+        self.display_background = None  # background scaled to the display once per update
         self.prev_background = None
+        self.transition_surface = None
         self.transition_progress = 0.0
+        self.preview_surface = None  # tiny autoencoder preview of the generation in progress
+        self.preview_alpha = 0
+        self.preview_composite = None
         
         # Render state
         self.last_render_request = None
@@ -44,29 +52,101 @@ class SurfaceManager:
     def update_hands(self, surface):
         """Update the hands surface and return it directly"""
         self.hands_surface = surface
+        self.display_hands = None
         return surface
     
-    def update_background(self, image_data):
-        """Update the background surface with new image data"""
-        # Save previous background for transitions
-        if self.background_surface:
-            self.prev_background = self.background_surface
-            self.transition_progress = 0.0
+    def _scale_to_display(self, image_data, background_surface):
+        """Scale a generated PIL image to a display-sized surface.
+        
+        Runs once per background on the worker thread, so frames only blit the result.
+        """
+        upscale_config = self.config.render.get('upscale', {})
+        if upscale_config.get('enabled', False):
+            # Low-resolution generation: high quality upscale straight to the display size
+            scaled = upscale_pil_image(
+                image_data,
+                self.display_width,
+                self.display_height,
+                method=upscale_config.get('method', 'lanczos'),
+                model_path=upscale_config.get('superres_model')
+            )
+            return pygame.surfarray.make_surface(np.array(scaled).swapaxes(0, 1))
+        return pygame.transform.scale(background_surface, (self.display_width, self.display_height))
+    
+    def prepare_frame(self, image_data, color, metadata=None):
+        """Build display-ready surfaces for a new background.
         
+        Runs on the worker thread and touches no state read by the render loop; the
+        frame is handed over through the mailbox and applied with adopt_frame.
+        """
         # Convert PIL Image (RGB) to pygame surface
         array = np.array(image_data)
-        self.background_surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
+        background_surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
+        return BackgroundFrame(background_surface, self._scale_to_display(image_data, background_surface), color, metadata)
+    
+    def prepare_preview(self, image_data, step, num_steps):
+        """Build a display-sized preview frame on the worker thread.
         
-        if self.debug:
-            save_debug_image(pygame.surfarray.array3d(self.background_surface), "background")
+        Previews are scaled with a plain resize; the upscaler only runs for final images.
+        """
+        array = np.array(image_data)
+        preview_surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
+        display_preview = pygame.transform.scale(preview_surface, (self.display_width, self.display_height))
+        return BackgroundFrame(None, display_preview, None, {"step": step, "num_steps": num_steps})
+    
+    def adopt_preview(self, frame):
+        """Show a preview, fading it in as the generation progresses (render thread only)"""
+        max_opacity = self.config.render.get('preview', {}).get('max_opacity', 160)
+        self.preview_surface = frame.display_background
+        self.preview_alpha = int(max_opacity * frame.metadata["step"] / frame.metadata["num_steps"])
+    
+    def clear_preview(self):
+        """Drop the preview, e.g. after a cancelled or failed generation (render thread only)"""
+        self.preview_surface = None
+    
+    def adopt_frame(self, frame):
+        """Switch to a prepared background (render thread only)"""
+        # Save previous background for transitions, starting from the preview if one is showing
+        if self.preview_surface is not None and self.preview_composite is not None:
+            self.prev_background = self.preview_composite.copy()
+            self.transition_progress = 0.0
+        elif self.background_surface:
+            self.prev_background = self.display_background
+            self.transition_progress = 0.0
+        self.preview_surface = None
+        
+        self.background_surface = frame.background_surface
+        self.display_background = frame.display_background
+        if frame.metadata is not None:
+            self.last_render_request = frame.metadata
+    
+    def update_background(self, image_data):
+        """Update the background surface with new image data (render thread only)"""
+        self.adopt_frame(self.prepare_frame(image_data, None))
     
     def get_display_background(self):
+        """Get the current background surface with transitions and any preview on top"""
+        background = self._get_base_background()
+        if self.preview_surface is None or background is None:
+            return background
+        
+        # Blend the in-progress preview over the current background
+        if self.preview_composite is None:
+            self.preview_composite = pygame.Surface((self.display_width, self.display_height))
+        self.preview_composite.blit(background, (0, 0))
+        self.preview_surface.set_alpha(self.preview_alpha)
+        self.preview_composite.blit(self.preview_surface, (0, 0))
+        return self.preview_composite
+    
+    def _get_base_background(self):
         """Get the current background surface, handling transitions"""
-        if not self.background_surface:
+        if not self.display_background:
             if not self.hands_surface:
                 return None
             # Show clock hands until first background is received
-            return pygame.transform.scale(self.hands_surface, (self.display_width, self.display_height))
+            if self.display_hands is None:
+                self.display_hands = pygame.transform.scale(self.hands_surface, (self.display_width, self.display_height))
+            return self.display_hands
             
         # Handle transitions
         if self.prev_background and self.transition_progress < 1.0:
@@ -76,22 +156,19 @@ class SurfaceManager:
             self.transition_progress += 1.0 / (fps * duration)
             self.transition_progress = min(1.0, self.transition_progress)
             
-            # Create transition surface
-            transition = pygame.Surface((self.display_width, self.display_height))
-            
-            # Draw previous and current backgrounds
-            transition.blit(pygame.transform.scale(self.prev_background, (self.display_width, self.display_height)), (0, 0))
-            current = pygame.transform.scale(self.background_surface, (self.display_width, self.display_height))
-            
-            # Set alpha for current background
-            current.set_alpha(int(255 * self.transition_progress))
+            # Reuse the transition surface between frames
+            if self.transition_surface is None:
+                self.transition_surface = pygame.Surface((self.display_width, self.display_height))
             
-            # Blend backgrounds
-            transition.blit(current, (0, 0))
-            return transition
+            # Draw previous background, then current background with alpha for the blend
+            self.transition_surface.blit(self.prev_background, (0, 0))
+            self.display_background.set_alpha(int(255 * self.transition_progress))
+            self.transition_surface.blit(self.display_background, (0, 0))
+            self.display_background.set_alpha(None)
+            return self.transition_surface
         else:
-            # Return scaled background
-            return pygame.transform.scale(self.background_surface, (self.display_width, self.display_height))
+            # Return background already scaled to the display
+            return self.display_background
     
     def update_render_request(self, render_request):
         """Update the last render request"""
@@ -101,7 +178,7 @@ class SurfaceManager:
         """Save metadata about the current state"""
         metadata = {
             "index": index,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": get_time_source().now().isoformat()
         }
         
         # Save render request if available
@@ -127,22 +204,22 @@ class SurfaceManager:
         if not self.hands_surface:
             return
             
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = get_time_source().now().strftime("%Y%m%d_%H%M%S")
+        writer = ImageWriter()
         
-        # Save clock face
-        pygame.image.save(self.hands_surface, f"{self.snapshots_dir}/{timestamp}_1_clock.png")
+        # Save clock face (copied here, encoded and written on the writer thread)
+        writer.submit_image(surface_to_pil(self.hands_surface), f"{self.snapshots_dir}/{timestamp}_1_clock")
         
         # Save metadata
         metadata = self.save_metadata(0)
-        with open(f"{self.snapshots_dir}/{timestamp}_2_metadata.json", 'w') as f:
-            json.dump(metadata, f, indent=2)
+        writer.submit_json(metadata, f"{self.snapshots_dir}/{timestamp}_2_metadata.json")
         
-        if self.debug:
+        if self.debug and 'seed' in metadata:
             print(f"Saved metadata with seed {metadata['seed']} and checkpoint {metadata['checkpoint']}")
         
         # Save current background if available
         if self.background_surface:
-            pygame.image.save(self.background_surface, f"{self.snapshots_dir}/{timestamp}_3_background.png")
+            writer.submit_image(surface_to_pil(self.background_surface), f"{self.snapshots_dir}/{timestamp}_3_background")
     
     def set_background_updater(self, background_updater):
         """Set the background updater instance"""
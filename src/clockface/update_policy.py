@@ -0,0 +1,119 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from ..utils.time_source import get_time_source
+
+class UpdatePolicy(ABC):
+    """Abstract base class for deciding when a new background should be generated"""
+    # How often to re-read the display power state file (seconds)
+    DISPLAY_POWER_CHECK_INTERVAL = 5
+
+    def __init__(self, config):
+        self.config = config
+        self.policy_config = config.animation.get('update_policy', {})
+        self.update_interval = config.animation['background_update_interval']
+        self.display_active = True
+        self.last_activity = 0
+        self._display_powered = True
+        self._power_checked_at = 0
+
+    @abstractmethod
+    def is_due(self, now, last_attempt):
+        """Whether a new background is due, given the current and last attempt timestamps"""
+        pass
+
+    def should_update(self, now, last_attempt, min_interval=0):
+        """Whether to start a new generation now.
+
+        min_interval is an additional minimum gap between attempts (e.g. failure backoff).
+        """
+        if not self.is_display_active(now):
+            return False
+        if now - last_attempt < min_interval:
+            return False
+        return self.is_due(now, last_attempt)
+
+    def set_display_active(self, active):
+        """Record whether the display is visible (window shown, screen not blanked)"""
+        self.display_active = active
+
+    def notify_activity(self, now=None):
+        """Record user input"""
+        self.last_activity = now if now is not None else get_time_source().time()
+
+    def is_display_active(self, now):
+        """The display is active unless hidden or powered off"""
+        return self.display_active and self._is_display_powered(now)
+
+    def _is_display_powered(self, now):
+        """Read the optional display power file (e.g. a backlight bl_power or DRM dpms node)"""
+        path = self.policy_config.get('display_power_path')
+        if not path:
+            return True
+        if now - self._power_checked_at >= self.DISPLAY_POWER_CHECK_INTERVAL:
+            self._power_checked_at = now
+            try:
+                with open(path, 'r') as f:
+                    # bl_power reports 0 when powered, dpms reports On
+                    self._display_powered = f.read().strip().lower() in ('0', 'on')
+            except OSError:
+                self._display_powered = True
+        return self._display_powered
+
+class FixedIntervalPolicy(UpdatePolicy):
+    """Regenerate every background_update_interval seconds"""
+    def is_due(self, now, last_attempt):
+        return now - last_attempt >= self.update_interval
+
+class MinuteChangePolicy(UpdatePolicy):
+    """Regenerate only when the displayed minute (and so the clock hands) changes"""
+    def is_due(self, now, last_attempt):
+        current_minute = datetime.fromtimestamp(now).replace(second=0, microsecond=0)
+        last_minute = datetime.fromtimestamp(last_attempt).replace(second=0, microsecond=0)
+        return current_minute != last_minute
+
+class QuietHoursPolicy(FixedIntervalPolicy):
+    """Fixed interval, with a reduced rate during quiet hours unless someone is interacting"""
+    def __init__(self, config):
+        super().__init__(config)
+        quiet_config = self.policy_config.get('quiet_hours', {})
+        self.quiet_start = self._parse_time(quiet_config.get('start', '23:00'))
+        self.quiet_end = self._parse_time(quiet_config.get('end', '07:00'))
+        self.quiet_interval = quiet_config.get('interval', 300)
+        self.activity_window = self.policy_config.get('activity_window', 60)
+
+    @staticmethod
+    def _parse_time(value):
+        hours, minutes = str(value).split(':')
+        return int(hours) * 60 + int(minutes)
+
+    def in_quiet_hours(self, now):
+        current = datetime.fromtimestamp(now)
+        minute_of_day = current.hour * 60 + current.minute
+        if self.quiet_start <= self.quiet_end:
+            return self.quiet_start <= minute_of_day < self.quiet_end
+        # Window wraps around midnight
+        return minute_of_day >= self.quiet_start or minute_of_day < self.quiet_end
+
+    def is_due(self, now, last_attempt):
+        recently_active = now - self.last_activity < self.activity_window
+        if self.in_quiet_hours(now) and not recently_active:
+            return now - last_attempt >= self.quiet_interval
+        return super().is_due(now, last_attempt)
+
+class UpdatePolicyFactory:
+    """Factory class for creating background update policies"""
+    POLICIES = {
+        'interval': FixedIntervalPolicy,
+        'minute': MinuteChangePolicy,
+        'quiet_hours': QuietHoursPolicy,
+    }
+
+    @staticmethod
+    def create_policy(config):
+        strategy = config.animation.get('update_policy', {}).get('strategy', 'interval')
+        policy_class = UpdatePolicyFactory.POLICIES.get(strategy)
+        if policy_class is None:
+            print(f"Unknown update policy '{strategy}', using fixed interval")
+            policy_class = FixedIntervalPolicy
+        return policy_class(config)
@@ -1,12 +1,23 @@
 import yaml
 from pathlib import Path
 
+def _deep_update(target, updates):
+    """Merge nested dicts from updates into target, copying the dicts it changes"""
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            target[key] = dict(target[key])
+            _deep_update(target[key], value)
+        else:
+            target[key] = value
+
 class Config:
     _instance = None
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(Config, cls).__new__(cls)
+            # In-memory overrides for this process; never saved and kept across reloads
+            cls._instance._overrides = {}
             cls._instance._load_config()
         return cls._instance
     
@@ -40,10 +51,23 @@ class Config:
     
     def update(self, *keys, value):
         """Update a configuration value in local_config.yaml at any nesting level"""
+        self._set_nested(self._local_config, keys, value)
+        self.save_local()
+        return True
+    
+    def override(self, *keys, value):
+        """Set a configuration value for this process only.
+        
+        Overrides take precedence over both config files and are never written to
+        local_config.yaml, even when update() saves other settings.
+        """
+        self._set_nested(self._overrides, keys, value)
+    
+    @staticmethod
+    def _set_nested(current, keys, value):
         if len(keys) < 1:
             raise ValueError("At least one key must be provided")
             
-        current = self._local_config
         # Navigate to the deepest dict, creating paths as needed
         for key in keys[:-1]:
             if key not in current:
@@ -54,23 +78,22 @@ class Config:
             
         # Set the final value
         current[keys[-1]] = value
-        self.save_local()
-        return True
     
     def get(self, *keys, default=None):
-        """Get a nested configuration value using dot notation, checking local overrides first"""
-        # Try local config first
-        local_value = self._local_config
-        for key in keys:
-            try:
-                local_value = local_value[key]
-            except (KeyError, TypeError):
-                local_value = None
-                break
-                
-        # If we found a complete path in local config, return it
-        if local_value is not None:
-            return local_value
+        """Get a nested configuration value using dot notation, checking overrides first"""
+        # Try process overrides, then local config
+        for layer in (self._overrides, self._local_config):
+            local_value = layer
+            for key in keys:
+                try:
+                    local_value = local_value[key]
+                except (KeyError, TypeError):
+                    local_value = None
+                    break
+                    
+            # If we found a complete path in this layer, return it
+            if local_value is not None:
+                return local_value
         
         # Fall back to base config
         value = self._base_config
@@ -86,6 +109,7 @@ class Config:
         base = self._base_config.get(section_name, {}).copy()
         local = self._local_config.get(section_name, {})
         base.update(local)
+        _deep_update(base, self._overrides.get(section_name, {}))
         return base
     
     @property
@@ -114,4 +138,16 @@ class Config:
         
     @property
     def prompts(self):
-        return self._merge_config_section('prompts') 
\ No newline at end of file
+        return self._merge_config_section('prompts')
+    
+    @property
+    def history(self):
+        return self._merge_config_section('history')
+    
+    @property
+    def output(self):
+        return self._merge_config_section('output')
+    
+    @property
+    def diagnostics(self):
+        return self._merge_config_section('diagnostics')
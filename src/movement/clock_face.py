@@ -3,6 +3,7 @@ import math
 import random
 from datetime import datetime
 from ..config import Config
+from ..utils.text_cache import TextCache
 
 class ClockFace:
     def __init__(self, width, height):
@@ -49,28 +50,34 @@ class ClockFace:
         self.render_surface = pygame.Surface((width, height), pygame.SRCALPHA)  # RGBA for diffusion
         self.overlay_surface = pygame.Surface((width, height), pygame.SRCALPHA)  # RGBA for overlay
         
-        # Initialize font for numbers
+        # Initialize font for numbers; rendered numerals are shared through the text cache
+        text_cache = TextCache()
         try:
             # Try to use Arial first, fall back to system default if not available
-            self.font = pygame.font.SysFont('Helvetica', self.config.clock['font_size'], bold=True)
+            self.font = text_cache.get_font('Helvetica', self.config.clock['font_size'], bold=True)
             # Test if the font renders properly
             test_render = self.font.render('12', True, (255, 255, 255))
             if not test_render:
                 raise Exception("Font not rendering properly")
         except:
             # Fall back to default font if Arial is not available
-            self.font = pygame.font.Font(None, self.config.clock['font_size'])
+            self.font = text_cache.get_font(None, self.config.clock['font_size'])
         
         # Update background color with random variation
         self._update_background_color()
 
-    def _update_background_color(self):
+    def _update_background_color(self, hours=None, minutes=None):
         """Update background color with random darkness variation"""
         base_color = self.config.render['background_color'][0]  # All components are the same
         variation = self.config.render['background_darkness_variation']
         
+        # With the ControlNet cache, keep the control image identical within a minute
+        rng = random
+        if hours is not None and self.config.render.get('controlnet_cache', {}).get('enabled', False):
+            rng = random.Random(hours * 60 + minutes)
+        
         # Generate random factor between (1 - variation) and (1 + variation)
-        factor = 1.0 + random.uniform(-variation, variation)
+        factor = 1.0 + rng.uniform(-variation, variation)
         
         # Apply factor to base color, ensuring it stays within 0-255
         varied_color = max(0, min(255, int(base_color * factor)))
@@ -125,26 +132,15 @@ class ClockFace:
             # Convert 0 to 12
             hour_num = 12 if hour == 0 else hour
             
-            # Create text surface
+            # Overlay numerals are drawn solid, render numerals with the overlay opacity
             if is_overlay:
-                # Simple direct rendering with no background
-                text = self.font.render(str(hour_num), True, (255, 255, 255))
-                # Convert surface to include alpha channel if it doesn't already
-                if text.get_flags() & pygame.SRCALPHA == 0:
-                    alpha_surface = pygame.Surface(text.get_size(), pygame.SRCALPHA)
-                    alpha_surface.fill((0, 0, 0, 0))  # Fill with transparent black
-                    alpha_surface.blit(text, (0, 0))
-                    text = alpha_surface
+                text_color = (255, 255, 255)
             else:
-                # For screen display, create a surface with alpha channel
-                text = pygame.Surface(self.font.size(str(hour_num)), pygame.SRCALPHA)
-                text.fill((0, 0, 0, 0))  # Fill with transparent black
-                rendered_text = self.font.render(str(hour_num), True, (255, 255, 255, self.config.clock['overlay_opacity']))
-                text.blit(rendered_text, (0, 0))
+                text_color = (255, 255, 255, self.config.clock['overlay_opacity'])
             
-            # Rotate the text
+            # Get the rotated text from the cache
             rotation_angle = math.degrees(angle) + 90  # Add 90 to align text properly
-            rotated_text = pygame.transform.rotate(text, -rotation_angle)
+            rotated_text = self.font.render(str(hour_num), True, text_color, rotation=-rotation_angle)
             
             # Get the rect of the rotated surface and position it
             text_rect = rotated_text.get_rect(center=pos)
@@ -168,7 +164,7 @@ class ClockFace:
         self._update_hand_lengths()
         
         # Update background color with random variation
-        self._update_background_color()
+        self._update_background_color(hours, minutes)
         
         # Clear the surfaces
         self.overlay_surface.fill((0, 0, 0, 0))
@@ -1,3 +1,4 @@
 from .settings_ui import SettingsUI
+from .perf_hud import PerfHUD
 
-__all__ = ['SettingsUI'] 
\ No newline at end of file
+__all__ = ['SettingsUI', 'PerfHUD'] 
\ No newline at end of file
@@ -0,0 +1,101 @@
+import time
+from collections import deque
+
+import pygame
+
+from ..config import Config
+from ..utils.diagnostics import process_rss
+
+class PerfHUD:
+    """On-screen performance overlay for the render loop.
+
+    Sections of each frame are timed with lap() calls. The HUD text is re-rendered into
+    a cached surface only a few times per second; other frames just blit it.
+    """
+    # Frames kept for percentiles and the effective FPS
+    HISTORY = 300
+    # Seconds between HUD text updates
+    REFRESH_INTERVAL = 0.25
+    # update: events, clock hands and the worker handoff; settings: settings panel and HUD
+    SECTIONS = ('update', 'background', 'overlay', 'settings', 'flip')
+
+    def __init__(self, background_updater=None):
+        self.config = Config()
+        self.background_updater = background_updater
+        self.font = pygame.font.Font(None, 24)
+        self.frame_times = deque(maxlen=self.HISTORY)  # start-to-start, includes the tick wait
+        self.section_times = {name: deque(maxlen=self.HISTORY) for name in self.SECTIONS}
+        self.frame_start = None
+        self.lap_start = None
+        self.enabled = self.config.display.get('hud', False)
+        self.surface = None
+        self.last_refresh = 0
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.frame_times.append(now - self.frame_start)
+        self.frame_start = now
+        self.lap_start = now
+
+    def lap(self, section):
+        """Record the time since the previous lap (or frame start) under a section"""
+        now = time.perf_counter()
+        self.section_times[section].append(now - self.lap_start)
+        self.lap_start = now
+
+    def draw(self, surface):
+        now = time.perf_counter()
+        if now - self.last_refresh >= self.REFRESH_INTERVAL:
+            self.last_refresh = now
+            # Picks up changes made from the settings panel
+            self.enabled = self.config.display.get('hud', False)
+            self.surface = self._render() if self.enabled else None
+        if self.surface is not None:
+            surface.blit(self.surface, (10, 10))
+
+    def _render(self):
+        lines = self._lines()
+        rendered = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+        width = max(text.get_width() for text in rendered) + 20
+        line_height = self.font.get_linesize()
+        hud_surface = pygame.Surface((width, line_height * len(rendered) + 20), pygame.SRCALPHA)
+        hud_surface.fill((0, 0, 0, 170))
+        for i, text in enumerate(rendered):
+            hud_surface.blit(text, (10, 10 + i * line_height))
+        return hud_surface
+
+    def _lines(self):
+        target_fps = self.config.display['fps']
+        lines = []
+        if self.frame_times:
+            times = sorted(self.frame_times)
+            fps = len(times) / sum(times)
+            lines.append(f"FPS {fps:.1f} / {target_fps}")
+            lines.append(
+                f"Frame ms p50 {_percentile(times, 50) * 1000:.1f}  p95 {_percentile(times, 95) * 1000:.1f}  "
+                f"p99 {_percentile(times, 99) * 1000:.1f}  max {times[-1] * 1000:.1f}"
+            )
+        sections = "  ".join(
+            f"{name} {sum(values) / len(values) * 1000:.1f}"
+            for name, values in self.section_times.items() if values
+        )
+        if sections:
+            lines.append(f"Avg ms  {sections}")
+
+        updater = self.background_updater
+        if updater is not None:
+            lines.append(f"Worker: {updater.worker_state()}")
+            if updater.last_generation_time is not None:
+                lines.append(f"Last generation: {updater.last_generation_time:.1f}s")
+            device_memory = updater.pipeline.device_memory()
+            if device_memory:
+                lines.append(f"Device memory: {device_memory}")
+        rss = process_rss()
+        if rss is not None:
+            lines.append(f"Process RSS: {rss / (1024 * 1024):.0f} MB")
+        return lines or ["No frames yet"]
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
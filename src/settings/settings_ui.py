@@ -3,10 +3,32 @@ import pygame.gfxdraw
 import random
 import os
 import json
+import threading
 from datetime import datetime
 from ..config import Config
+from ..utils.downloader import ModelDownloader
+from ..utils.model_catalog import ModelCatalog
+from ..utils.text_cache import TextCache
 import time
-import requests
+
+def render_notification(font, message):
+    """Pre-render a notification box; fading is applied with set_alpha on the result"""
+    message_surface = pygame.Surface((500, 60), pygame.SRCALPHA)
+    
+    # Draw semi-transparent background
+    pygame.draw.rect(message_surface, (40, 40, 40, 200), message_surface.get_rect(), border_radius=10)
+    pygame.draw.rect(message_surface, (80, 80, 80, 200), message_surface.get_rect(), 2, border_radius=10)
+    
+    message_text = font.render(message, True, (255, 255, 255))
+    message_surface.blit(message_text, message_text.get_rect(center=(250, 30)))
+    return message_surface
+
+def render_overlay(width, height):
+    """Darkened full-screen overlay drawn behind modal dialogs"""
+    overlay = pygame.Surface((width, height))
+    overlay.fill((0, 0, 0))
+    overlay.set_alpha(180)
+    return overlay
 
 class Dialog:
     def __init__(self, screen_width, screen_height, font):
@@ -21,12 +43,17 @@ class Dialog:
         self.message = ""
         self.title = ""
         self.callback = None
+        # Pre-rendered surfaces, rebuilt only when the content changes
+        self._dialog_surface = None
+        self._notification_surface = None
+        self._overlay = None
         
     def show_confirmation(self, title, message, callback):
         """Show a confirmation dialog with Yes/No buttons"""
         self.title = title
         self.message = message
         self.callback = callback
+        self._dialog_surface = None
         self.duration = None
         self.buttons = ["Yes", "No"]
         self.visible = True
@@ -35,6 +62,7 @@ class Dialog:
         """Show a temporary notification message"""
         self.title = ""
         self.message = message
+        self._notification_surface = None
         self.callback = None
         self.duration = duration
         self.buttons = []
@@ -109,30 +137,20 @@ class Dialog:
             if self.duration is not None:
                 alpha = int(255 * (1 - (time.time() - self.start_time) / self.duration))
             
-            # Draw notification with wider width
-            message_surface = pygame.Surface((500, 60), pygame.SRCALPHA)
-            message_text = self.font.render(self.message, True, (255, 255, 255))
-            text_rect = message_text.get_rect(center=(250, 30))
-            
-            # Draw semi-transparent background
-            pygame.draw.rect(message_surface, (40, 40, 40, min(200, alpha)), message_surface.get_rect(), border_radius=10)
-            pygame.draw.rect(message_surface, (80, 80, 80, min(200, alpha)), message_surface.get_rect(), 2, border_radius=10)
-            
-            # Apply fade out to text
-            message_text.set_alpha(alpha)
-            message_surface.blit(message_text, text_rect)
+            if self._notification_surface is None:
+                self._notification_surface = render_notification(self.font, self.message)
+            self._notification_surface.set_alpha(alpha)
             
             # Position at bottom center of screen
             message_x = (self.screen_width - 500) // 2
             message_y = self.screen_height - 80
-            surface.blit(message_surface, (message_x, message_y))
+            surface.blit(self._notification_surface, (message_x, message_y))
             return
             
         # Draw darkened overlay for confirmation dialogs
-        overlay = pygame.Surface((self.screen_width, self.screen_height))
-        overlay.fill((0, 0, 0))
-        overlay.set_alpha(180)
-        surface.blit(overlay, (0, 0))
+        if self._overlay is None:
+            self._overlay = render_overlay(self.screen_width, self.screen_height)
+        surface.blit(self._overlay, (0, 0))
         
         # Draw confirmation dialog
         dialog_width = 400
@@ -140,6 +158,12 @@ class Dialog:
         dialog_x = (self.screen_width - dialog_width) // 2
         dialog_y = (self.screen_height - dialog_height) // 2
         
+        if self._dialog_surface is None:
+            self._dialog_surface = self._render_confirmation(dialog_width, dialog_height)
+        surface.blit(self._dialog_surface, (dialog_x, dialog_y))
+    
+    def _render_confirmation(self, dialog_width, dialog_height):
+        """Pre-render the confirmation dialog"""
         dialog_surface = pygame.Surface((dialog_width, dialog_height), pygame.SRCALPHA)
         pygame.draw.rect(dialog_surface, (40, 40, 40, 250), dialog_surface.get_rect())
         pygame.draw.rect(dialog_surface, (80, 80, 80), dialog_surface.get_rect(), 2)
@@ -175,7 +199,7 @@ class Dialog:
         text_x = dialog_width - self.padding - button_width + (button_width - no_text.get_width()) // 2
         dialog_surface.blit(no_text, (text_x, button_y + (button_height - no_text.get_height()) // 2))
         
-        surface.blit(dialog_surface, (dialog_x, dialog_y))
+        return dialog_surface
 
 class StylesDialog:
     def __init__(self, screen_width, screen_height, font):
@@ -199,6 +223,10 @@ class StylesDialog:
         self.items_per_column = (len(self.all_styles) + 1) // 2
         self.dialog_height = max(self.items_per_column * self.item_height + self.header_height + self.padding * 2, 200)
         
+        # Pre-rendered surfaces, rebuilt when a style is toggled
+        self._dialog_surface = None
+        self._overlay = None
+        
     def toggle(self):
         self.visible = not self.visible
         
@@ -226,6 +254,7 @@ class StylesDialog:
             checkbox_rect = pygame.Rect(checkbox_x, checkbox_y, self.item_height, self.item_height)
             
             if checkbox_rect.collidepoint(pos[0], pos[1]):
+                self._dialog_surface = None
                 if style in self.enabled_styles:
                     # Don't allow disabling if it's the last enabled style
                     if len(self.enabled_styles) > 1:
@@ -245,15 +274,20 @@ class StylesDialog:
             return
             
         # Draw darkened overlay
-        overlay = pygame.Surface((self.screen_width, self.screen_height))
-        overlay.fill((0, 0, 0))
-        overlay.set_alpha(180)
-        surface.blit(overlay, (0, 0))
+        if self._overlay is None:
+            self._overlay = render_overlay(self.screen_width, self.screen_height)
+        surface.blit(self._overlay, (0, 0))
         
         # Calculate dialog position
         dialog_x = (self.screen_width - self.dialog_width) // 2
         dialog_y = (self.screen_height - self.dialog_height) // 2
         
+        if self._dialog_surface is None:
+            self._dialog_surface = self._render()
+        surface.blit(self._dialog_surface, (dialog_x, dialog_y))
+    
+    def _render(self):
+        """Pre-render the dialog with the current style selection"""
         # Draw dialog background
         dialog_surface = pygame.Surface((self.dialog_width, self.dialog_height), pygame.SRCALPHA)
         pygame.draw.rect(dialog_surface, (40, 40, 40, 250), dialog_surface.get_rect())
@@ -292,10 +326,11 @@ class StylesDialog:
             style_text = self.font.render(style.replace('_', ' ').title(), True, (255, 255, 255))
             dialog_surface.blit(style_text, (checkbox_x + self.item_height + 10, checkbox_y + 10))
         
-        surface.blit(dialog_surface, (dialog_x, dialog_y))
+        return dialog_surface
 
 class SettingsUI:
-    def __init__(self, screen_width, screen_height, background_updater=None, surface_manager=None):
+    def __init__(self, screen_width, screen_height, background_updater=None, surface_manager=None, auto_download=True):
+        """auto_download: fetch the default model when no compatible checkpoint exists (off in soak.py)"""
         self.config = Config()
         self.screen_width = screen_width
         self.screen_height = screen_height
@@ -303,15 +338,22 @@ class SettingsUI:
         self.background_updater = background_updater
         self.surface_manager = surface_manager
         self.checkpoint_changed = False
+        self.model_downloader = None
         self.notification = None
         self.notification_start = 0
         self.notification_duration = None
+        # Notifications are also posted from the download and reload threads
+        self.notification_lock = threading.Lock()
+        # Pre-rendered surfaces; the panel is rebuilt only when a setting value changes
+        self._panel_surface = None
+        self._notification_surface = None
+        self._notification_text = None  # message the cached notification surface shows
         
         # UI settings
         self.padding = 30
         self.item_height = 60
         self.font_size = 32
-        self.font = pygame.font.Font(None, self.font_size)
+        self.font = TextCache().get_font(None, self.font_size)
         self.panel_width = 600
         
         # Dialog system
@@ -326,7 +368,8 @@ class SettingsUI:
         # Font options for random selection
         self.font_options = ["Arial", "Helvetica", "Times New Roman", "Brush Script MT"]
         
-        # Get available models
+        # Get available models from the catalog
+        self.model_catalog = ModelCatalog()
         self.available_models = self._get_available_models()
 
         # Get contrast levels from config
@@ -347,6 +390,12 @@ class SettingsUI:
                 'type': 'bool',
                 'value': self.config.clock['use_numbers']
             },
+            {
+                'name': 'Performance HUD',
+                'key': ('display', 'hud'),
+                'type': 'bool',
+                'value': self.config.display.get('hud', False)
+            },
             {
                 'name': 'Render Contrast',
                 'key': ('render', 'background_color'),
@@ -388,6 +437,11 @@ class SettingsUI:
 
         # Add styles dialog
         self.styles_dialog = StylesDialog(screen_width, screen_height, self.font)
+        
+        # No models found: download the default SD 1.5 without blocking the UI. Started last,
+        # since completion updates self.settings from the downloader thread.
+        if not self.available_models and auto_download:
+            self._download_default_model()
 
     def handle_shutdown(self, confirmed):
         """Handle shutdown confirmation"""
@@ -400,10 +454,15 @@ class SettingsUI:
             os.system(self.config.system['restart_cmd'])
 
     def show_notification(self, message, duration=2):
-        """Show a notification message"""
-        self.notification = message
-        self.notification_duration = duration
-        self.notification_start = time.time()
+        """Show a notification message (callable from any thread)"""
+        with self.notification_lock:
+            self.notification = message
+            self.notification_duration = duration
+            self.notification_start = time.time()
+    
+    def invalidate(self):
+        """Re-render the settings panel on the next draw"""
+        self._panel_surface = None
 
     def toggle(self):
         """Toggle settings visibility"""
@@ -416,7 +475,9 @@ class SettingsUI:
                 def on_pipeline_loaded():
                     self.show_notification("New checkpoint loaded", duration=2)
                     self.background_updater.last_attempt = 0  # Force update after loading
-                self.background_updater.reload_pipeline(complete_callback=on_pipeline_loaded)  # Reload with callback
+                def on_pipeline_error(error):
+                    self.show_notification(f"Checkpoint not loaded: {error}", duration=5)
+                self.background_updater.reload_pipeline(complete_callback=on_pipeline_loaded, error_callback=on_pipeline_error)  # Reload with callback
                 self.checkpoint_changed = False
             return
         self.visible = True
@@ -450,12 +511,16 @@ class SettingsUI:
                             return True
                             
                         current_value = setting['value']
+                        if current_value not in setting['options']:
+                            # e.g. no checkpoints yet while the default model downloads
+                            return True
                         current_index = setting['options'].index(current_value)
                         next_index = (current_index + 1) % len(setting['options'])
                         new_value = setting['options'][next_index]
                         
                         if new_value != current_value:  # Only update if value changed
                             setting['value'] = new_value
+                            self.invalidate()
                             
                             # Update config
                             section, key = setting['key']
@@ -472,6 +537,7 @@ class SettingsUI:
                         
                     elif setting['type'] == 'bool':
                         setting['value'] = not setting['value']
+                        self.invalidate()
                         section, key = setting['key']
                         self.config.update(section, key, value=setting['value'])
                         
@@ -511,89 +577,9 @@ class SettingsUI:
         """Draw the settings UI if visible"""
         if self.visible:
             # Draw settings panel
-            panel_surface = pygame.Surface((self.panel_width, self.panel_height), pygame.SRCALPHA)
-            pygame.draw.rect(panel_surface, self.panel_color, panel_surface.get_rect())
-            
-            # Draw settings items
-            for i, setting in enumerate(self.settings):
-                item_rect = pygame.Rect(
-                    0,
-                    self.padding + i * self.item_height,
-                    self.panel_width,
-                    self.item_height
-                )
-                
-                if setting['type'] == 'system_row':
-                    # Draw system row with two buttons
-                    button_width = (self.panel_width - 3 * self.padding) // 2
-                    button_height = self.item_height - 10
-                    button_y = self.padding + i * self.item_height + 5
-                    
-                    # Draw shutdown button
-                    shutdown_rect = pygame.Rect(
-                        self.padding,
-                        button_y,
-                        button_width,
-                        button_height
-                    )
-                    pygame.draw.rect(panel_surface, (180, 60, 60), shutdown_rect)
-                    shutdown_text = self.font.render("Shutdown", True, self.text_color)
-                    text_x = self.padding + (button_width - shutdown_text.get_width()) // 2
-                    text_y = button_y + (button_height - shutdown_text.get_height()) // 2
-                    panel_surface.blit(shutdown_text, (text_x, text_y))
-                    
-                    # Draw restart button
-                    restart_rect = pygame.Rect(
-                        self.padding * 2 + button_width,
-                        button_y,
-                        button_width,
-                        button_height
-                    )
-                    pygame.draw.rect(panel_surface, (60, 120, 180), restart_rect)
-                    restart_text = self.font.render("Restart", True, self.text_color)
-                    text_x = self.padding * 2 + button_width + (button_width - restart_text.get_width()) // 2
-                    text_y = button_y + (button_height - restart_text.get_height()) // 2
-                    panel_surface.blit(restart_text, (text_x, text_y))
-                elif setting['type'] == 'action' or setting['type'] == 'button':
-                    # Draw action/button button
-                    button_rect = pygame.Rect(
-                        self.padding,
-                        self.padding + i * self.item_height + 5,
-                        self.panel_width - 2 * self.padding,
-                        self.item_height - 10
-                    )
-                    pygame.draw.rect(panel_surface, self.active_color, button_rect)
-                    text = self.font.render(setting['name'], True, self.text_color)
-                    text_rect = text.get_rect(center=button_rect.center)
-                    panel_surface.blit(text, text_rect)
-                else:
-                    # Draw setting name
-                    text = self.font.render(setting['name'], True, self.text_color)
-                    panel_surface.blit(text, (self.padding, self.padding + i * self.item_height + 10))
-                    
-                    # Draw setting value
-                    if setting['type'] == 'bool':
-                        value_text = "On" if setting['value'] else "Off"
-                        color = self.active_color if setting['value'] else self.text_color
-                    elif setting['type'] == 'color_picker':
-                        value_text = f"RGB{tuple(setting['value'])}"
-                        color = self.text_color
-                    elif setting['type'] == 'dropdown':
-                        # Show shortened version of the checkpoint name
-                        value_text = setting['value'].split('_')[0]
-                        color = self.active_color
-                    elif setting['type'] == 'select':
-                        value_text = setting['value']
-                        color = self.active_color
-                    else:
-                        continue  # Skip rendering value for other types
-                    
-                    value_surface = self.font.render(value_text, True, color)
-                    value_x = self.panel_width - value_surface.get_width() - self.padding
-                    panel_surface.blit(value_surface, (value_x, self.padding + i * self.item_height + 10))
-            
-            # Draw panel on main surface
-            surface.blit(panel_surface, (self.panel_x, self.panel_y))
+            if self._panel_surface is None:
+                self._panel_surface = self._render_panel()
+            surface.blit(self._panel_surface, (self.panel_x, self.panel_y))
             
             # Draw dialog if visible
             self.dialog.draw(surface)
@@ -602,72 +588,171 @@ class SettingsUI:
             self.styles_dialog.draw(surface)
         
         # Draw notification if active
-        if self.notification:
+        with self.notification_lock:
+            message, duration, start = self.notification, self.notification_duration, self.notification_start
+        if message:
             current_time = time.time()
-            if self.notification_duration is None or current_time - self.notification_start <= self.notification_duration:
+            if duration is None or current_time - start <= duration:
                 # Calculate fade out alpha for notifications
                 alpha = 255
-                if self.notification_duration is not None:
-                    alpha = int(255 * (1 - (current_time - self.notification_start) / self.notification_duration))
-                
-                # Draw notification with wider width
-                message_surface = pygame.Surface((500, 60), pygame.SRCALPHA)
-                message_text = self.font.render(self.notification, True, (255, 255, 255))
-                text_rect = message_text.get_rect(center=(250, 30))
-                
-                # Draw semi-transparent background
-                pygame.draw.rect(message_surface, (40, 40, 40, min(200, alpha)), message_surface.get_rect(), border_radius=10)
-                pygame.draw.rect(message_surface, (80, 80, 80, min(200, alpha)), message_surface.get_rect(), 2, border_radius=10)
+                if duration is not None:
+                    alpha = int(255 * (1 - (current_time - start) / duration))
                 
-                # Apply fade out to text
-                message_text.set_alpha(alpha)
-                message_surface.blit(message_text, text_rect)
+                # The cached surface is checked against the text it shows, so a message
+                # posted from another thread while rendering is picked up on the next frame
+                if self._notification_surface is None or self._notification_text != message:
+                    self._notification_surface = render_notification(self.font, message)
+                    self._notification_text = message
+                self._notification_surface.set_alpha(alpha)
                 
                 # Position at bottom center of screen
                 message_x = (self.screen_width - 500) // 2
                 message_y = self.screen_height - 80
-                surface.blit(message_surface, (message_x, message_y))
+                surface.blit(self._notification_surface, (message_x, message_y))
+            else:
+                with self.notification_lock:
+                    # Keep a notification that was posted after this one expired
+                    if self.notification_start == start:
+                        self.notification = None
+                self._notification_surface = None
+                self._notification_text = None
+    
+    def _render_panel(self):
+        """Pre-render the settings panel with the current values"""
+        panel_surface = pygame.Surface((self.panel_width, self.panel_height), pygame.SRCALPHA)
+        pygame.draw.rect(panel_surface, self.panel_color, panel_surface.get_rect())
+        
+        # Draw settings items
+        for i, setting in enumerate(self.settings):
+            item_rect = pygame.Rect(
+                0,
+                self.padding + i * self.item_height,
+                self.panel_width,
+                self.item_height
+            )
+            
+            if setting['type'] == 'system_row':
+                # Draw system row with two buttons
+                button_width = (self.panel_width - 3 * self.padding) // 2
+                button_height = self.item_height - 10
+                button_y = self.padding + i * self.item_height + 5
+                
+                # Draw shutdown button
+                shutdown_rect = pygame.Rect(
+                    self.padding,
+                    button_y,
+                    button_width,
+                    button_height
+                )
+                pygame.draw.rect(panel_surface, (180, 60, 60), shutdown_rect)
+                shutdown_text = self.font.render("Shutdown", True, self.text_color)
+                text_x = self.padding + (button_width - shutdown_text.get_width()) // 2
+                text_y = button_y + (button_height - shutdown_text.get_height()) // 2
+                panel_surface.blit(shutdown_text, (text_x, text_y))
+                
+                # Draw restart button
+                restart_rect = pygame.Rect(
+                    self.padding * 2 + button_width,
+                    button_y,
+                    button_width,
+                    button_height
+                )
+                pygame.draw.rect(panel_surface, (60, 120, 180), restart_rect)
+                restart_text = self.font.render("Restart", True, self.text_color)
+                text_x = self.padding * 2 + button_width + (button_width - restart_text.get_width()) // 2
+                text_y = button_y + (button_height - restart_text.get_height()) // 2
+                panel_surface.blit(restart_text, (text_x, text_y))
+            elif setting['type'] == 'action' or setting['type'] == 'button':
+                # Draw action/button button
+                button_rect = pygame.Rect(
+                    self.padding,
+                    self.padding + i * self.item_height + 5,
+                    self.panel_width - 2 * self.padding,
+                    self.item_height - 10
+                )
+                pygame.draw.rect(panel_surface, self.active_color, button_rect)
+                text = self.font.render(setting['name'], True, self.text_color)
+                text_rect = text.get_rect(center=button_rect.center)
+                panel_surface.blit(text, text_rect)
             else:
-                self.notification = None
+                # Draw setting name
+                text = self.font.render(setting['name'], True, self.text_color)
+                panel_surface.blit(text, (self.padding, self.padding + i * self.item_height + 10))
+                
+                # Draw setting value
+                if setting['type'] == 'bool':
+                    value_text = "On" if setting['value'] else "Off"
+                    color = self.active_color if setting['value'] else self.text_color
+                elif setting['type'] == 'color_picker':
+                    value_text = f"RGB{tuple(setting['value'])}"
+                    color = self.text_color
+                elif setting['type'] == 'dropdown':
+                    # Show shortened version of the checkpoint name
+                    value_text = setting['value'].split('_')[0]
+                    color = self.active_color
+                elif setting['type'] == 'select':
+                    value_text = setting['value']
+                    color = self.active_color
+                else:
+                    continue  # Skip rendering value for other types
+                
+                value_surface = self.font.render(value_text, True, color)
+                value_x = self.panel_width - value_surface.get_width() - self.padding
+                panel_surface.blit(value_surface, (value_x, self.padding + i * self.item_height + 10))
+        
+        return panel_surface
 
     def _download_default_model(self):
-        """Download the default Stable Diffusion 1.5 model if no models are present"""
-        models_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'models')
-        os.makedirs(models_dir, exist_ok=True)
-        
-        model_url = self.config.render['models']['default_model']['url']
-        model_path = os.path.join(os.path.dirname(os.path.dirname(models_dir)), 
-                                 self.config.render['models']['default_model']['path'])
-        
-        # Show downloading notification
-        self.dialog.show_notification("Downloading Stable Diffusion 1.5...", duration=None)
-        
-        # Download with progress tracking
-        response = requests.get(model_url, stream=True)
-        total_size = int(response.headers.get('content-length', 0))
-        
-        with open(model_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        
-        self.dialog.show_notification("Download complete!", duration=2)
-        return self.config.render['models']['default_model']['path']
+        """Download the default Stable Diffusion 1.5 model in the background"""
+        app_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        default_model = self.config.render['models']['default_model']
+        model_path = os.path.join(app_dir, default_model['path'])
+        
+        def on_progress(downloaded, total):
+            if total:
+                self.show_notification(f"Downloading Stable Diffusion 1.5... {100 * downloaded // total}%", duration=None)
+            else:
+                self.show_notification(f"Downloading Stable Diffusion 1.5... {downloaded // (1024 * 1024)} MB", duration=None)
+        
+        def on_complete(path):
+            self.show_notification("Download complete!", duration=2)
+            self._on_default_model_downloaded(default_model['path'])
+        
+        def on_error(error):
+            self.show_notification("Model download failed", duration=5)
+        
+        self.show_notification("Downloading Stable Diffusion 1.5...", duration=None)
+        self.model_downloader = ModelDownloader(
+            default_model['url'],
+            model_path,
+            sha256=default_model.get('sha256'),
+            progress_callback=on_progress,
+            complete_callback=on_complete,
+            error_callback=on_error
+        ).start()
+    
+    def _on_default_model_downloaded(self, model_path):
+        """Make the downloaded model available and load it"""
+        self.model_catalog.refresh()
+        if model_path not in self.available_models:
+            self.available_models.append(model_path)
+        for setting in self.settings:
+            if setting.get('key') == ('render', 'checkpoint'):
+                setting['value'] = model_path
+        self.invalidate()
+        self.config.update('render', 'checkpoint', value=model_path)
+        if self.background_updater:
+            self.show_notification(f"Loading checkpoint: {model_path.split('_')[0]}...", duration=30)
+            def on_pipeline_loaded():
+                self.show_notification("New checkpoint loaded", duration=2)
+                self.background_updater.last_attempt = 0  # Force update after loading
+            self.background_updater.reload_pipeline(complete_callback=on_pipeline_loaded)
 
     def _get_available_models(self):
-        """Scan the models directory for available checkpoints"""
-        models_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'models')
-        models = []
-        if os.path.exists(models_dir):
-            for file in os.listdir(models_dir):
-                if file.endswith('.safetensors'):
-                    models.append(os.path.join('models', file))
-        
-        if not models:
-            # No models found, download default SD 1.5
-            default_model = self._download_default_model()
-            models.append(os.path.relpath(default_model, os.path.dirname(models_dir)))
-            # Update config to use the new model
-            self.config.update('render', 'checkpoint', models[0])
-            
+        """List the compatible checkpoints in the models directory"""
+        self.model_catalog.refresh()
+        models = self.model_catalog.compatible_models()
+        for path in self.model_catalog.entries:
+            if path not in models:
+                print(f"Skipping checkpoint: {self.model_catalog.is_compatible(path)[1]}")
         return models 
\ No newline at end of file
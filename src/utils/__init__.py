@@ -1,17 +1,23 @@
 from .image_utils import (
     save_debug_image,
+    surface_to_pil,
     scale_pil_image_to_display,
+    upscale_pil_image,
     pil_to_cv2,
     cv2_to_surface,
     morph_transition,
     get_dominant_color
 )
+from .image_writer import ImageWriter
 
 __all__ = [
     'save_debug_image',
     'scale_pil_image_to_display',
+    'upscale_pil_image',
     'pil_to_cv2',
     'cv2_to_surface',
     'morph_transition',
-    'get_dominant_color'
+    'get_dominant_color',
+    'surface_to_pil',
+    'ImageWriter'
 ] 
\ No newline at end of file
@@ -1,4 +1,14 @@
+import os
+import importlib.util
+
 import torch
+from ..config import Config
+
+DTYPES = {
+    "float32": torch.float32,
+    "float16": torch.float16,
+    "bfloat16": torch.bfloat16,
+}
 
 def get_best_device():
     """
@@ -9,4 +19,136 @@ def get_best_device():
         return "cuda"
     elif torch.backends.mps.is_available():
         return "mps"
-    return "cpu" 
\ No newline at end of file
+    return "cpu"
+
+# Modules of the ControlNet pipeline quantized on CPU
+QUANTIZED_MODULES = ("unet", "controlnet", "text_encoder")
+
+class ExecutionProfile:
+    """Per-device execution settings: weight dtype, attention backend, quantization and thread counts"""
+    def __init__(self, device, dtype, attention, num_threads=None, interop_threads=None, quantization="none"):
+        self.device = device
+        self.dtype = dtype
+        self.attention = attention
+        self.num_threads = num_threads
+        self.interop_threads = interop_threads
+        self.quantization = quantization
+
+    def describe(self):
+        """Short human readable summary of the chosen settings"""
+        threads = self.num_threads if self.num_threads else "default"
+        summary = f"device={self.device}, dtype={str(self.dtype).replace('torch.', '')}, attention={self.attention}, threads={threads}"
+        if self.quantization != "none":
+            summary += f", quantization={self.quantization}"
+        return summary
+
+    def apply_threads(self):
+        """Apply intra-op and inter-op thread counts to torch"""
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        if self.interop_threads:
+            try:
+                torch.set_num_interop_threads(self.interop_threads)
+            except RuntimeError:
+                # Can only be set once, before any inter-op parallel work has started
+                pass
+
+    def apply_attention(self, pipe):
+        """Configure the attention implementation of a diffusers pipeline"""
+        if self.attention == "xformers":
+            try:
+                pipe.enable_xformers_memory_efficient_attention()
+                return
+            except Exception as e:
+                print(f"xformers attention unavailable ({e}), falling back to SDPA")
+                self.attention = "sdpa"
+        if self.attention == "sliced":
+            pipe.enable_attention_slicing()
+        elif self.attention == "sdpa":
+            from diffusers.models.attention_processor import AttnProcessor2_0
+            pipe.unet.set_attn_processor(AttnProcessor2_0())
+            if getattr(pipe, "controlnet", None) is not None:
+                pipe.controlnet.set_attn_processor(AttnProcessor2_0())
+
+    def apply_quantization(self, pipe):
+        """Quantize the UNet, ControlNet and text encoder Linear layers to int8 (CPU only).
+
+        'dynamic' uses torch's dynamic quantization (int8 weights, activations quantized
+        per batch); 'weight_only' uses torchao int8 weight-only quantization.
+        Must run after LoRA weights are fused, since quantized layers can't be patched.
+        """
+        if self.quantization == "none":
+            return
+        if self.dtype != torch.float32:
+            print(f"Skipping {self.quantization} quantization: it needs float32 weights, not {self.dtype}")
+            self.quantization = "none"
+            return
+
+        if self.quantization == "weight_only":
+            if not _has_module("torchao"):
+                print("Weight-only quantization needs torchao, falling back to dynamic quantization")
+                self.quantization = "dynamic"
+            else:
+                from torchao.quantization import quantize_, int8_weight_only
+                for name in QUANTIZED_MODULES:
+                    module = getattr(pipe, name, None)
+                    if module is not None:
+                        quantize_(module, int8_weight_only())
+                return
+
+        if self.quantization == "dynamic":
+            for name in QUANTIZED_MODULES:
+                module = getattr(pipe, name, None)
+                if module is not None:
+                    torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        else:
+            print(f"Unknown quantization '{self.quantization}', running unquantized")
+            self.quantization = "none"
+
+    def transformers_kwargs(self):
+        """Model loading kwargs for transformers models (used by the prompt enhancer)"""
+        if self.device == "cuda":
+            attn_implementation = "flash_attention_2" if _has_module("flash_attn") and self.dtype != torch.float32 else "sdpa"
+            return {
+                "attn_implementation": attn_implementation,
+                "torch_dtype": self.dtype,
+                "device_map": "auto",
+                "use_cache": True,
+            }
+        # The prompt enhancer stays on the CPU for MPS and CPU devices
+        cpu_dtype = self.dtype if self.device == "cpu" else torch.float32
+        return {
+            "attn_implementation": "sdpa",
+            "torch_dtype": cpu_dtype,
+        }
+
+def _has_module(name):
+    return importlib.util.find_spec(name) is not None
+
+def _select_attention(device, requested):
+    """Resolve the 'auto' attention setting for the given device"""
+    if requested != "auto":
+        return requested
+    if device == "cuda" and _has_module("xformers"):
+        return "xformers"
+    return "sdpa"
+
+def get_execution_profile(device=None):
+    """Build the execution profile for a device from the render.execution config section"""
+    config = Config()
+    exec_config = config.render.get('execution', {})
+    device = device or get_best_device()
+
+    if device == "cpu":
+        dtype = DTYPES.get(exec_config.get('cpu_dtype', 'float32'), torch.float32)
+        num_threads = exec_config.get('num_threads', 0) or os.cpu_count()
+        interop_threads = exec_config.get('interop_threads', 0) or None
+        quantization = exec_config.get('cpu_quantization', 'none')
+    else:
+        dtype = torch.float16
+        num_threads = None
+        interop_threads = None
+        quantization = "none"
+
+    attention = _select_attention(device, exec_config.get('attention', 'auto'))
+    return ExecutionProfile(device, dtype, attention, num_threads, interop_threads, quantization)
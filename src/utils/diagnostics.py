@@ -0,0 +1,168 @@
+import os
+import sys
+import time
+import signal
+import faulthandler
+import threading
+import traceback
+from collections import Counter
+from datetime import datetime
+
+from ..config import Config
+
+def _diagnostics_dir():
+    directory = Config().diagnostics.get('directory', 'diagnostics')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+def _thread_names():
+    return {thread.ident: thread.name for thread in threading.enumerate()}
+
+def process_rss():
+    """Resident memory of this process in bytes (Linux), or None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def format_thread_dump():
+    """Current stack of every Python thread, with thread names"""
+    names = _thread_names()
+    lines = []
+    for ident, frame in sys._current_frames().items():
+        lines.append(f"Thread {names.get(ident, 'unknown')} ({ident}):")
+        lines.extend(line.rstrip('\n') for line in traceback.format_stack(frame))
+        lines.append("")
+    return "\n".join(lines)
+
+def write_thread_dump(reason):
+    """Write a stack dump of all threads to the diagnostics directory; returns the path"""
+    path = os.path.join(_diagnostics_dir(), f"threads_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{reason}.txt")
+    with open(path, 'w') as f:
+        f.write(f"Thread dump ({reason}) at {datetime.now().isoformat()}\n\n")
+        f.write(format_thread_dump())
+    print(f"Thread dump written to {path}")
+    return path
+
+class SamplingProfiler:
+    """Time-bounded sampling profiler covering all Python threads.
+
+    A background thread samples every thread's stack at a fixed interval. Samples
+    are written as collapsed stacks ("thread;outer;...;inner count", the flamegraph.pl /
+    speedscope input format) together with a thread dump taken at the start.
+    """
+    def __init__(self, duration=30, interval=0.01):
+        self.duration = duration
+        self.interval = interval
+        self.thread = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.running:
+            print("Profiler already running")
+            return False
+        self.thread = threading.Thread(target=self._run, name="SamplingProfiler")
+        self.thread.daemon = True
+        self.thread.start()
+        return True
+
+    def _run(self):
+        started = datetime.now()
+        dump = format_thread_dump()
+        print(f"Sampling all threads for {self.duration}s")
+        own_ident = threading.get_ident()
+        samples = Counter()
+        sample_count = 0
+        end_time = time.monotonic() + self.duration
+        while time.monotonic() < end_time:
+            names = _thread_names()
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                samples[";".join(reversed(stack))] += 1
+            sample_count += 1
+            time.sleep(self.interval)
+
+        prefix = os.path.join(_diagnostics_dir(), f"profile_{started.strftime('%Y%m%d_%H%M%S')}")
+        with open(f"{prefix}.collapsed", 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(f"{prefix}_threads.txt", 'w') as f:
+            f.write(f"Thread dump at profile start ({started.isoformat()}), {sample_count} samples taken\n\n")
+            f.write(dump)
+        print(f"Profile written to {prefix}.collapsed")
+
+class FrameTracer:
+    """Periodic frame-time summaries of the render loop, written to a log file while enabled"""
+    def __init__(self, target_fps, interval=5):
+        self.target_fps = target_fps
+        self.interval = interval
+        self.enabled = False
+        self.path = None
+        self.frame_times = []
+        self.window_start = 0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        if self.enabled:
+            self.path = os.path.join(_diagnostics_dir(), f"frames_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+            self.frame_times = []
+            self.window_start = time.monotonic()
+            print(f"Frame-time tracing on, writing to {self.path}")
+        else:
+            print("Frame-time tracing off")
+
+    def record(self, frame_time):
+        if not self.enabled:
+            return
+        self.frame_times.append(frame_time)
+        now = time.monotonic()
+        if now - self.window_start < self.interval:
+            return
+        times = sorted(self.frame_times)
+        slow = sum(1 for t in times if t > 2.0 / self.target_fps)
+        line = (f"{datetime.now().isoformat()} frames={len(times)} fps={len(times) / (now - self.window_start):.1f} "
+                f"p50={times[len(times) // 2] * 1000:.1f}ms p95={times[int(len(times) * 0.95)] * 1000:.1f}ms "
+                f"max={times[-1] * 1000:.1f}ms slow={slow}\n")
+        with open(self.path, 'a') as f:
+            f.write(line)
+        self.frame_times = []
+        self.window_start = now
+
+# Kept open for faulthandler, which writes to the file descriptor from its C signal handler
+_fault_log = None
+
+def install_signal_handlers(frame_tracer):
+    """SIGUSR1 starts a sampling profile of all threads, SIGUSR2 toggles frame-time tracing.
+
+    SIGUSR1 also appends a C-level stack dump of all threads to faulthandler_<pid>.log.
+    Python signal handlers only run when the main thread executes bytecode, so this is
+    the only output if the render loop itself is stuck in a lock, a C call or a flip.
+    Returns the profiler, or None where these signals don't exist (Windows).
+    """
+    global _fault_log
+    if not hasattr(signal, 'SIGUSR1'):
+        return None
+    diagnostics_config = Config().diagnostics
+    profiler = SamplingProfiler(
+        duration=diagnostics_config.get('profile_duration', 30),
+        interval=diagnostics_config.get('sample_interval', 0.01)
+    )
+    # Handlers run on the main thread between frames; they only start work elsewhere
+    signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.start())
+    signal.signal(signal.SIGUSR2, lambda signum, frame: frame_tracer.toggle())
+    # Dumps immediately from the C handler, then chains to the Python handler above
+    _fault_log = open(os.path.join(_diagnostics_dir(), f"faulthandler_{os.getpid()}.log"), 'a')
+    faulthandler.register(signal.SIGUSR1, file=_fault_log, all_threads=True, chain=True)
+    print(f"Diagnostics: kill -USR1 {os.getpid()} to profile, kill -USR2 {os.getpid()} to toggle frame tracing")
+    return profiler
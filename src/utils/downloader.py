@@ -0,0 +1,147 @@
+import os
+import time
+import hashlib
+import threading
+
+import requests
+
+class DownloadError(Exception):
+    """Raised when a download fails or its checksum does not match"""
+    pass
+
+class ModelDownloader:
+    """Resumable, checksummed file download that runs on a background thread.
+
+    Data is streamed into `<path>.part` in large chunks and resumed with an HTTP Range
+    request after interruptions. The file is only moved into place after the optional
+    SHA-256 matches. Works against any HTTP server, including a local stand-in.
+    """
+    CHUNK_SIZE = 4 * 1024 * 1024
+    # Minimum seconds between progress callbacks
+    PROGRESS_INTERVAL = 1.0
+    MAX_RETRIES = 5
+    RETRY_DELAY = 5  # seconds, doubled after each failed attempt
+
+    def __init__(self, url, path, sha256=None, timeout=(10, 60), session=None,
+                 progress_callback=None, complete_callback=None, error_callback=None):
+        self.url = url
+        self.path = path
+        self.part_path = f"{path}.part"
+        self.sha256 = sha256.lower() if sha256 else None
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.progress_callback = progress_callback
+        self.complete_callback = complete_callback
+        self.error_callback = error_callback
+        self.downloaded = 0
+        self.total_size = None
+        self.thread = None
+        self._cancelled = threading.Event()
+        self._last_progress = 0
+
+    def start(self):
+        """Start the download on a daemon thread"""
+        self.thread = threading.Thread(target=self._run, name="ModelDownloader")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        """Stop the download; the partial file is kept for resuming later"""
+        self._cancelled.set()
+
+    def _run(self):
+        try:
+            self.download()
+            if self.complete_callback:
+                self.complete_callback(self.path)
+        except Exception as e:
+            print(f"Download of {self.url} failed: {e}")
+            if self.error_callback:
+                self.error_callback(e)
+
+    def download(self):
+        """Download synchronously, retrying and resuming on connection errors"""
+        if os.path.exists(self.path):
+            return self.path
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        delay = self.RETRY_DELAY
+        for attempt in range(1, self.MAX_RETRIES + 1):
+            try:
+                self._download_attempt()
+                break
+            except requests.RequestException as e:
+                if self._cancelled.is_set() or attempt == self.MAX_RETRIES:
+                    raise DownloadError(f"Giving up after {attempt} attempts: {e}") from e
+                print(f"Download interrupted ({e}), resuming in {delay}s (attempt {attempt}/{self.MAX_RETRIES})")
+                time.sleep(delay)
+                delay *= 2
+
+        self._verify()
+        os.replace(self.part_path, self.path)
+        return self.path
+
+    def _download_attempt(self):
+        """Fetch the remaining bytes, appending to the partial file"""
+        offset = os.path.getsize(self.part_path) if os.path.exists(self.part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+        with self.session.get(self.url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # Requested range starts at or past the end: complete only if the sizes match
+                remote_size = self._remote_size()
+                if remote_size == offset:
+                    self.downloaded = self.total_size = offset
+                    return
+                print(f"Partial download is {offset} bytes but the remote file is {remote_size}, starting over")
+                response.close()
+                os.remove(self.part_path)
+                return self._download_attempt()
+            response.raise_for_status()
+
+            if offset and response.status_code != 206:
+                # Server ignored the range request, start over
+                offset = 0
+            content_length = int(response.headers.get('content-length', 0))
+            self.total_size = offset + content_length if content_length else None
+            self.downloaded = offset
+
+            with open(self.part_path, 'ab' if offset else 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                    if self._cancelled.is_set():
+                        raise DownloadError("Download cancelled")
+                    if chunk:
+                        f.write(chunk)
+                        self.downloaded += len(chunk)
+                        self._report_progress()
+
+        if self.total_size is not None and self.downloaded < self.total_size:
+            raise requests.ConnectionError(f"Connection closed after {self.downloaded} of {self.total_size} bytes")
+        self._report_progress(force=True)
+
+    def _remote_size(self):
+        """Size of the remote file from a HEAD request, or None if the server doesn't say"""
+        response = self.session.head(self.url, allow_redirects=True, timeout=self.timeout)
+        response.raise_for_status()
+        content_length = response.headers.get('content-length')
+        return int(content_length) if content_length else None
+
+    def _verify(self):
+        """Check the SHA-256 of the completed partial file"""
+        if not self.sha256:
+            return
+        digest = hashlib.sha256()
+        with open(self.part_path, 'rb') as f:
+            for block in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                digest.update(block)
+        if digest.hexdigest() != self.sha256:
+            os.remove(self.part_path)
+            raise DownloadError(f"Checksum mismatch for {self.path}: expected {self.sha256}, got {digest.hexdigest()}")
+
+    def _report_progress(self, force=False):
+        now = time.time()
+        if not self.progress_callback or (not force and now - self._last_progress < self.PROGRESS_INTERVAL):
+            return
+        self._last_progress = now
+        self.progress_callback(self.downloaded, self.total_size)
@@ -4,32 +4,35 @@ from datetime import datetime
 import cv2
 import numpy as np
 import os
+import re
 from ..config import Config
+from .image_writer import ImageWriter
 import time
 
+def surface_to_pil(surface):
+    """Copy a pygame surface into a PIL image (RGBA if the surface has per-pixel alpha)"""
+    mode = 'RGBA' if surface.get_flags() & pygame.SRCALPHA else 'RGB'
+    return Image.frombytes(mode, surface.get_size(), pygame.image.tostring(surface, mode))
+
 def save_debug_image(image, prefix):
-    """Save a debug image with timestamp.
+    """Queue a debug image with timestamp for writing by the background image writer.
     
     Args:
-        image: Either a pygame Surface or PIL Image
+        image: A pygame Surface, PIL Image or numpy array
         prefix: String prefix for the filename (e.g., 'prerender' or 'background')
     """
-    # Create debug directory if it doesn't exist
-    os.makedirs('debug', exist_ok=True)
-    
     # Generate debug filename with timestamp
     timestamp = time.strftime("%H%M%S")
-    debug_filename = f"debug/debug_{prefix}_{timestamp}.png"
     
-    # Convert numpy array to PIL Image if needed
+    # Convert to a PIL Image now; surfaces must not be touched from the writer thread
     if isinstance(image, np.ndarray):
         image = Image.fromarray(image.astype('uint8'))
     elif isinstance(image, pygame.Surface):
-        image = Image.fromarray(pygame.surfarray.array3d(image))
+        image = surface_to_pil(image)
     
-    # Save the image
-    image.save(debug_filename)
-    print(f"Saved {prefix} debug image to {debug_filename}")
+    # Queue the image
+    debug_filename = ImageWriter().submit_image(image, f"debug/debug_{prefix}_{timestamp}")
+    print(f"Queued {prefix} debug image for {debug_filename}")
 
 def scale_pil_image_to_display(pil_image, target_width, target_height):
     """Scale a PIL image to the target resolution"""
@@ -53,6 +56,57 @@ def scale_pil_image_to_display(pil_image, target_width, target_height):
     # Convert back to PIL
     return Image.fromarray(cv2.cvtColor(scaled, cv2.COLOR_BGR2RGB))
 
+_superres_models = {}
+
+def _get_superres_model(model_path):
+    """Load (once) an OpenCV dnn_superres model such as FSRCNN_x2.pb.
+    
+    Returns None if opencv-contrib is not installed or the model file is missing.
+    """
+    if model_path in _superres_models:
+        return _superres_models[model_path]
+    
+    model = None
+    if not hasattr(cv2, 'dnn_superres'):
+        print("Super-resolution requires opencv-contrib-python, using Lanczos instead")
+    elif not os.path.exists(model_path):
+        print(f"Super-resolution model not found: {model_path}, using Lanczos instead")
+    else:
+        # Model name and scale come from the file name, e.g. FSRCNN_x2.pb -> ('fsrcnn', 2)
+        match = re.fullmatch(r'([a-z]+)_x(\d+)', os.path.splitext(os.path.basename(model_path))[0].lower())
+        if match is None:
+            print(f"Can't tell model type and scale from {model_path} (expected e.g. FSRCNN_x2.pb), using Lanczos instead")
+        else:
+            try:
+                model = cv2.dnn_superres.DnnSuperResImpl_create()
+                model.readModel(model_path)
+                model.setModel(match.group(1), int(match.group(2)))
+            except cv2.error as e:
+                print(f"Failed to load super-resolution model {model_path} ({e}), using Lanczos instead")
+                model = None
+    
+    _superres_models[model_path] = model
+    return model
+
+def upscale_pil_image(pil_image, target_width, target_height, method='lanczos', model_path=None):
+    """Upscale a PIL image to the target resolution.
+    
+    Args:
+        pil_image: Image to upscale
+        target_width, target_height: Output resolution
+        method: 'lanczos' or 'superres' (OpenCV dnn_superres model, followed by Lanczos to the exact size)
+        model_path: Path of the super-resolution model for the 'superres' method
+    """
+    if method == 'superres' and model_path:
+        model = _get_superres_model(model_path)
+        if model is not None:
+            upscaled = model.upsample(pil_to_cv2(pil_image))
+            pil_image = Image.fromarray(cv2.cvtColor(upscaled, cv2.COLOR_BGR2RGB))
+    
+    if pil_image.size == (target_width, target_height):
+        return pil_image
+    return scale_pil_image_to_display(pil_image, target_width, target_height)
+
 def pil_to_cv2(pil_image):
     """Convert PIL image to CV2 format"""
     return cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
@@ -0,0 +1,112 @@
+import os
+import json
+import threading
+from collections import deque
+
+from ..config import Config
+
+class ImageWriter:
+    """Background writer for debug images, snapshots and their metadata.
+
+    Encoding and disk I/O happen on a single worker thread. The queue is bounded; when
+    it is full the oldest pending write is dropped. After each write the target
+    directory is trimmed to its configured retention limit.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ImageWriter, cls).__new__(cls)
+            cls._instance._init_writer()
+        return cls._instance
+
+    def _init_writer(self):
+        self.config = Config()
+        output_config = self.config.output
+        self.image_format = output_config.get('image_format', 'png')
+        self.png_compress_level = output_config.get('png_compress_level', 1)
+        self.webp_quality = output_config.get('webp_quality', 90)
+        self.retention = output_config.get('retention', {})
+        self.queue = deque()
+        self.max_depth = output_config.get('queue_depth', 8)
+        self.condition = threading.Condition()
+        self.pending = 0
+        self.dropped = 0
+        self.thread = None
+
+    @property
+    def extension(self):
+        return 'webp' if self.image_format == 'webp' else 'png'
+
+    def submit_image(self, image, path_without_ext):
+        """Queue a PIL image for writing; returns the final file path"""
+        path = f"{path_without_ext}.{self.extension}"
+        self._submit(('image', image, path))
+        return path
+
+    def submit_json(self, data, path):
+        """Queue a JSON document for writing"""
+        self._submit(('json', data, path))
+        return path
+
+    def flush(self, timeout=None):
+        """Wait until all queued writes are done"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.pending == 0, timeout=timeout)
+
+    def _submit(self, job):
+        with self.condition:
+            if len(self.queue) >= self.max_depth:
+                # Under pressure keep the newest images
+                self.queue.popleft()
+                self.pending -= 1
+                self.dropped += 1
+                print(f"Image writer queue full, dropped oldest write ({self.dropped} dropped so far)")
+            self.queue.append(job)
+            self.pending += 1
+            self.condition.notify_all()
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="ImageWriter")
+                self.thread.daemon = True
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.queue)
+                kind, payload, path = self.queue.popleft()
+            try:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                if kind == 'image':
+                    self._write_image(payload, path)
+                else:
+                    with open(path, 'w') as f:
+                        json.dump(payload, f, indent=2)
+                self._apply_retention(os.path.dirname(path))
+            except Exception as e:
+                print(f"Error writing {path}: {e}")
+            finally:
+                with self.condition:
+                    self.pending -= 1
+                    self.condition.notify_all()
+
+    def _write_image(self, image, path):
+        if self.image_format == 'webp':
+            image.save(path, format='WEBP', quality=self.webp_quality, method=0)
+        else:
+            image.save(path, format='PNG', compress_level=self.png_compress_level)
+
+    def _apply_retention(self, directory):
+        """Delete the oldest files in a directory beyond its retention limit"""
+        limit = self.retention.get(os.path.basename(os.path.normpath(directory)), 0)
+        if not limit:
+            return
+        entries = [entry for entry in os.scandir(directory) if entry.is_file()]
+        if len(entries) <= limit:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - limit]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
@@ -0,0 +1,175 @@
+import os
+import json
+import mmap
+import struct
+import hashlib
+import threading
+
+# Checkpoint architectures the ControlNet pipeline can load
+COMPATIBLE_ARCHITECTURES = ('sd15',)
+
+# Cross-attention key of the first UNet transformer block in original (LDM) checkpoints
+LDM_CROSS_ATTENTION_KEY = 'model.diffusion_model.input_blocks.1.1.transformer_blocks.0.attn2.to_k.weight'
+LDM_INPUT_CONV_KEY = 'model.diffusion_model.input_blocks.0.0.weight'
+
+def read_safetensors_header(path):
+    """Read the JSON header of a safetensors file without loading any weights.
+
+    Returns (header, header_sha256) where header maps tensor names to dtype/shape/offsets
+    and may contain a '__metadata__' entry.
+    """
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            header_size = struct.unpack('<Q', mapped[:8])[0]
+            if header_size > len(mapped) - 8:
+                raise ValueError(f"Invalid safetensors header size in {path}")
+            header_bytes = mapped[8:8 + header_size]
+    return json.loads(header_bytes), hashlib.sha256(header_bytes).hexdigest()
+
+def detect_architecture(header):
+    """Guess the model family from tensor names and shapes"""
+    keys = [key for key in header if key != '__metadata__']
+    if any(key.startswith('conditioner.embedders.') for key in keys):
+        return 'sdxl'
+    if any('lora_down' in key or 'lora_A' in key or key.startswith('lora_') for key in keys):
+        return 'lora'
+    if LDM_CROSS_ATTENTION_KEY in header:
+        context_dim = header[LDM_CROSS_ATTENTION_KEY]['shape'][1]
+        if context_dim == 1024:
+            return 'sd2'
+        if context_dim == 768:
+            in_channels = header.get(LDM_INPUT_CONV_KEY, {}).get('shape', [0, 4])[1]
+            return 'sd15' if in_channels == 4 else 'sd15-inpaint'
+    if any(key.startswith('down_blocks.') for key in keys):
+        return 'diffusers-component'
+    return 'unknown'
+
+class ModelCatalog:
+    """Cached per-checkpoint metadata for the models directory.
+
+    Metadata comes from the safetensors header only (read through mmap, no weights are
+    loaded) and is stored in models/.catalog.json. A refresh only re-reads files whose
+    size or mtime changed. The hash is the SHA-256 of the header, which identifies a
+    checkpoint without reading gigabytes of weights.
+    """
+    CATALOG_FILE = '.catalog.json'
+
+    def __init__(self, models_dir=None):
+        app_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        self.app_dir = app_dir
+        self.models_dir = models_dir or os.path.join(app_dir, 'models')
+        self.catalog_path = os.path.join(self.models_dir, self.CATALOG_FILE)
+        self.lock = threading.Lock()
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.catalog_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        os.makedirs(self.models_dir, exist_ok=True)
+        temp_path = f"{self.catalog_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(temp_path, self.catalog_path)
+
+    def _relative_path(self, filename):
+        """Path as used in the config, e.g. models/foo.safetensors"""
+        return os.path.relpath(os.path.join(self.models_dir, filename), self.app_dir)
+
+    def refresh(self):
+        """Update the catalog for added, changed and removed checkpoints"""
+        with self.lock:
+            changed = False
+            seen = set()
+            files = os.listdir(self.models_dir) if os.path.exists(self.models_dir) else []
+            for filename in files:
+                if not filename.endswith('.safetensors'):
+                    continue
+                path = self._relative_path(filename)
+                seen.add(path)
+                stat = os.stat(os.path.join(self.models_dir, filename))
+                entry = self.entries.get(path)
+                if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                    continue
+                self.entries[path] = self._read_entry(os.path.join(self.models_dir, filename), stat)
+                changed = True
+
+            for path in list(self.entries):
+                if path not in seen:
+                    del self.entries[path]
+                    changed = True
+
+            # Converted (diffusers format) copies can appear without the checkpoint changing
+            for path, entry in self.entries.items():
+                converted = self._has_converted_form(path)
+                if entry.get('converted') != converted:
+                    entry['converted'] = converted
+                    changed = True
+
+            if changed:
+                self._save()
+            return self.entries
+
+    def _read_entry(self, full_path, stat):
+        entry = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+        }
+        try:
+            header, header_sha256 = read_safetensors_header(full_path)
+            metadata = header.pop('__metadata__', {}) or {}
+            dtypes = {}
+            parameters = 0
+            for info in header.values():
+                dtypes[info['dtype']] = dtypes.get(info['dtype'], 0) + 1
+                count = 1
+                for dim in info['shape']:
+                    count *= dim
+                parameters += count
+            entry.update({
+                'architecture': detect_architecture(header),
+                'header_sha256': header_sha256,
+                'tensors': len(header),
+                'parameters': parameters,
+                'dtypes': dtypes,
+                'metadata': metadata,
+                'error': None,
+            })
+        except Exception as e:
+            entry.update({'architecture': 'invalid', 'error': str(e)})
+        return entry
+
+    def _has_converted_form(self, path):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return os.path.exists(os.path.join(self.models_dir, stem, 'model_index.json'))
+
+    def get(self, path):
+        return self.entries.get(os.path.normpath(path))
+
+    def is_compatible(self, path):
+        """Return (compatible, reason) for a checkpoint path.
+
+        Checkpoints outside the models directory (e.g. an absolute path in
+        local_config.yaml) are checked by reading their safetensors header directly;
+        other formats can't be inspected and are assumed to be compatible.
+        """
+        entry = self.get(path)
+        if entry is None:
+            if not os.path.exists(path):
+                return False, f"{path} not found"
+            if not path.endswith('.safetensors'):
+                return True, None
+            entry = self._read_entry(path, os.stat(path))
+        if entry.get('error'):
+            return False, f"{os.path.basename(path)} is not a valid safetensors file"
+        if entry['architecture'] not in COMPATIBLE_ARCHITECTURES:
+            return False, f"{os.path.basename(path)} is a {entry['architecture']} model, expected SD 1.5"
+        return True, None
+
+    def compatible_models(self):
+        """Sorted paths of checkpoints the pipeline can load"""
+        return sorted(path for path in self.entries if self.is_compatible(path)[0])
@@ -0,0 +1,109 @@
+import time
+from collections import OrderedDict
+
+import pygame
+
+from ..config import Config
+
+class CachedFont:
+    """Font wrapper whose render() results come from the shared TextCache.
+
+    Rendered surfaces are shared between callers and must not be drawn on.
+    """
+    def __init__(self, cache, key, font):
+        self.cache = cache
+        self.key = key
+        self.font = font
+
+    def render(self, text, antialias, color, background=None, rotation=0):
+        return self.cache.render(self, text, antialias, color, background, rotation)
+
+    def size(self, text):
+        return self.font.size(text)
+
+    def get_height(self):
+        return self.font.get_height()
+
+class TextCache:
+    """Shared LRU cache of rendered text for the clock face and settings UI.
+
+    Entries are keyed by font, size, string, colour and rotation, so clock numerals and
+    UI labels are rendered and rotated once and reused across frames.
+    """
+    _instance = None
+    # Seconds between hit rate reports in debug mode
+    REPORT_INTERVAL = 60
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(TextCache, cls).__new__(cls)
+            cls._instance._init_cache()
+        return cls._instance
+
+    def _init_cache(self):
+        self.config = Config()
+        self.max_entries = self.config.display.get('text_cache_size', 512)
+        self.entries = OrderedDict()
+        self.fonts = {}
+        self.hits = 0
+        self.misses = 0
+        self.debug = False
+        self.last_report = time.time()
+
+    def get_font(self, name=None, size=32, bold=False):
+        """Get a cached font by system font name; None selects pygame's default font"""
+        key = (name, size, bold)
+        if key not in self.fonts:
+            if name is None:
+                font = pygame.font.Font(None, size)
+            else:
+                font = pygame.font.SysFont(name, size, bold=bold)
+            self.fonts[key] = CachedFont(self, key, font)
+        return self.fonts[key]
+
+    def render(self, font, text, antialias, color, background=None, rotation=0):
+        """Render text with per-pixel alpha, optionally rotated (degrees, counterclockwise)"""
+        rotation = round(rotation, 2) % 360
+        key = (font.key, text, antialias, tuple(color), tuple(background) if background else None, rotation)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+            surface = self._render(font.font, text, antialias, color, background, rotation)
+            self.entries[key] = surface
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        self._maybe_report()
+        return surface
+
+    @staticmethod
+    def _render(font, text, antialias, color, background, rotation):
+        surface = font.render(text, antialias, color, background)
+        # Convert surface to include alpha channel if it doesn't already
+        if surface.get_flags() & pygame.SRCALPHA == 0:
+            alpha_surface = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
+            alpha_surface.fill((0, 0, 0, 0))
+            alpha_surface.blit(surface, (0, 0))
+            surface = alpha_surface
+        if rotation:
+            surface = pygame.transform.rotate(surface, rotation)
+        return surface
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        self.entries.clear()
+
+    def _maybe_report(self):
+        if not self.debug:
+            return
+        now = time.time()
+        if now - self.last_report >= self.REPORT_INTERVAL:
+            self.last_report = now
+            print(f"Text cache: {self.hit_rate:.1%} hit rate ({self.hits} hits, {self.misses} misses, "
+                  f"{len(self.entries)}/{self.max_entries} entries)")
@@ -0,0 +1,45 @@
+import time
+import threading
+from datetime import datetime
+
+class TimeSource:
+    """Wall clock used for scheduling and timestamps.
+
+    Everything that decides when to update or what time to show reads the time through
+    get_time_source(), so tests and the soak harness can substitute a simulated clock.
+    """
+    def time(self):
+        return time.time()
+
+    def now(self):
+        return datetime.now()
+
+class SimulatedTimeSource(TimeSource):
+    """Clock that only moves when advance() is called"""
+    def __init__(self, start=None):
+        self.current = start if start is not None else time.time()
+        self.lock = threading.Lock()
+
+    def time(self):
+        with self.lock:
+            return self.current
+
+    def now(self):
+        return datetime.fromtimestamp(self.time())
+
+    def advance(self, seconds):
+        with self.lock:
+            self.current += seconds
+            return self.current
+
+_time_source = TimeSource()
+
+def get_time_source():
+    return _time_source
+
+def set_time_source(source):
+    """Replace the process-wide time source; returns the previous one"""
+    global _time_source
+    previous = _time_source
+    _time_source = source
+    return previous